@@ -0,0 +1,201 @@
+import argparse
+import sys
+import time
+
+from array import array
+from collections import OrderedDict, deque
+from itertools import islice
+
+import degrees
+
+from degrees import load_data
+
+
+class SearchTree():
+    """
+    Breadth-first search tree rooted at one person that grows lazily:
+    each lookup only expands as far as needed to reach its target, and
+    later lookups resume from where the last one stopped.
+
+    Parents are kept in flat arrays indexed by person, so every tree
+    takes the same size(graph) bytes, however far it has grown.
+    """
+
+    def __init__(self, graph, source):
+        self.graph = graph
+        self.source = source
+        # The movie and person each reached person was reached through;
+        # parent_people is -1 for people not reached yet
+        self.parent_movies = array("i", [-1]) * graph.num_people
+        self.parent_people = array("i", [-1]) * graph.num_people
+        self.parent_people[source] = source
+        self.expanded = bytearray(graph.num_movies)
+        self.queue = deque([source])
+
+    @staticmethod
+    def size(graph):
+        """Returns the bytes a search tree over graph takes."""
+        return 8 * graph.num_people + graph.num_movies
+
+    def path_to(self, target):
+        """
+        Returns the shortest list of (movie, person) integer pairs from
+        the root to target, or None if they are not connected.
+        """
+        graph = self.graph
+        parent_movies = self.parent_movies
+        parent_people = self.parent_people
+        expanded = self.expanded
+        queue = self.queue
+        while parent_people[target] < 0 and queue:
+            person = queue.popleft()
+            for movie in graph.movies_of(person):
+                if expanded[movie]:
+                    continue
+                expanded[movie] = 1
+                for neighbor in graph.stars_of(movie):
+                    if parent_people[neighbor] < 0:
+                        parent_movies[neighbor] = movie
+                        parent_people[neighbor] = person
+                        queue.append(neighbor)
+        if parent_people[target] < 0:
+            return None
+
+        path = []
+        while target != self.source:
+            path.append((parent_movies[target], target))
+            target = parent_people[target]
+        path.reverse()
+        return path
+
+
+class TreeCache():
+    """
+    Keeps the search trees of the most recently used sources,
+    as many as fit in budget bytes.
+    """
+
+    def __init__(self, graph, budget):
+        self.graph = graph
+        self.capacity = budget // SearchTree.size(graph)
+        self.trees = OrderedDict()
+
+    def get(self, source):
+        tree = self.trees.get(source)
+        if tree is not None:
+            self.trees.move_to_end(source)
+            return tree
+        tree = SearchTree(self.graph, source)
+        if self.capacity > 0:
+            self.trees[source] = tree
+            if len(self.trees) > self.capacity:
+                self.trees.popitem(last=False)
+        return tree
+
+
+def resolve(person):
+    """
+    Returns the person integer for an IMDb id or an unambiguous name,
+    or None if there is no such person or the name is ambiguous.
+    """
+    graph = degrees.graph
+    index = graph.person_index(person)
+    if index is not None:
+        return index
+    matches = graph.people_named(person.lower())
+    if len(matches) == 1:
+        return matches[0]
+    return None
+
+
+def answer(lines, cache, out):
+    """
+    Answers one block of query lines, grouped by source so that each
+    search tree is reused for every target it has to reach, and writes
+    the results in input order.
+    Returns the number of queries answered.
+    """
+    graph = degrees.graph
+
+    # Each query is (source, target, error), with people resolved to
+    # integers unless error says why they could not be
+    queries = []
+    by_source = {}
+    for line in lines:
+        if not line.strip():
+            continue
+        fields = line.rstrip("\n").split("\t")
+        if len(fields) != 2:
+            queries.append((line.strip(), "", "invalid query"))
+            continue
+        source, target = resolve(fields[0]), resolve(fields[1])
+        if source is None or target is None:
+            missing = fields[0] if source is None else fields[1]
+            queries.append((*fields, f"unknown or ambiguous: {missing}"))
+            continue
+        by_source.setdefault(source, []).append(len(queries))
+        queries.append((source, target, None))
+
+    results = [None] * len(queries)
+    for source, positions in by_source.items():
+        tree = cache.get(source)
+        for i in positions:
+            results[i] = tree.path_to(queries[i][1])
+
+    for (source, target, error), path in zip(queries, results):
+        if error is not None:
+            out.write(f"{source}\t{target}\tERROR\t{error}\n")
+            continue
+        source = graph.person_ids[source]
+        target = graph.person_ids[target]
+        if path is None:
+            out.write(f"{source}\t{target}\tNONE\t\n")
+        else:
+            steps = " ".join(f"{movie_id}:{person_id}"
+                             for movie_id, person_id in graph.path_ids(path))
+            out.write(f"{source}\t{target}\t{len(path)}\t{steps}\n")
+    return len(queries)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Answer tab-separated source/target queries in bulk, "
+                    "writing source, target, degrees and path per line. "
+                    "People may be given by IMDb id or unambiguous name."
+    )
+    parser.add_argument("directory", nargs="?", default="large")
+    parser.add_argument("queries", nargs="?", default="-",
+                        help="query file, or - for standard input")
+    parser.add_argument("--block", type=int, default=10000,
+                        help="queries grouped together by source")
+    parser.add_argument("--cache-mb", type=int, default=256,
+                        help="megabytes of search trees of recent sources "
+                             "to keep; each takes 8 bytes per person and "
+                             "1 per movie (default: %(default)s)")
+    args = parser.parse_args()
+
+    load_data(args.directory)
+    cache = TreeCache(degrees.graph, args.cache_mb * 2 ** 20)
+
+    if args.queries == "-":
+        f = sys.stdin
+    else:
+        f = open(args.queries, encoding="utf-8")
+    count = 0
+    start = time.perf_counter()
+    with f:
+        while True:
+            lines = list(islice(f, args.block))
+            if not lines:
+                break
+            count += answer(lines, cache, sys.stdout)
+            sys.stdout.flush()
+    elapsed = time.perf_counter() - start
+
+    rate = count / elapsed if elapsed > 0 else float("inf")
+    print(f"{count} queries in {elapsed:.2f}s ({rate:.1f} queries/sec)",
+          file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,17 @@
+import argparse
 import csv
 import sys
 
-from util import Node, StackFrontier, QueueFrontier
+from collections import deque
+from heapq import heappush, heappop
+from itertools import islice
+from operator import itemgetter
+
+import instrument
+import landmarks
+import snapshot
+
+from graph import Graph, NamesView, PeopleView, MoviesView
 
 # Maps names to a set of corresponding person_ids
 names = {}
@@ -12,55 +22,135 @@ people = {}
 # Maps movie_ids to a dictionary of: title, year, stars (a set of person_ids)
 movies = {}
 
+# Integer-indexed person/movie graph that searches run over
+graph = None
+
+# Landmark distances used to guide searches, if built for the dataset
+landmark_index = None
+
+# Returned by iterative deepening when it stops at its depth limit
+# without showing that the people are not connected
+CUTOFF = "cutoff"
+
 
 def load_data(directory):
     """
     Load data from CSV files into memory.
+
+    The parsed graph is saved as a binary snapshot next to the CSV files,
+    and later calls map that snapshot instead of parsing again for as long
+    as the CSV files are unchanged.
     """
-    # Load people
-    with open(f"{directory}/people.csv", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            people[row["id"]] = {
-                "name": row["name"],
-                "birth": row["birth"],
-                "movies": set()
-            }
-            if row["name"].lower() not in names:
-                names[row["name"].lower()] = {row["id"]}
-            else:
-                names[row["name"].lower()].add(row["id"])
-
-    # Load movies
-    with open(f"{directory}/movies.csv", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            movies[row["id"]] = {
-                "title": row["title"],
-                "year": row["year"],
-                "stars": set()
-            }
-
-    # Load stars
-    with open(f"{directory}/stars.csv", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            try:
-                people[row["person_id"]]["movies"].add(row["movie_id"])
-                movies[row["movie_id"]]["stars"].add(row["person_id"])
-            except KeyError:
-                pass
-
-
-#r
+    global graph, landmark_index, names, people, movies
+
+    graph = snapshot.load_graph(directory)
+    if graph is None:
+        report = {}
+        graph = parse_data(directory, report)
+        if any(report.values()):
+            print(f"Skipped {report['skipped']} malformed rows or repeated "
+                  f"ids, {report['dangling']} stars naming unknown people "
+                  f"or movies and {report['duplicates']} repeated stars.",
+                  file=sys.stderr)
+        try:
+            snapshot.save_graph(graph, directory)
+        except OSError:
+            pass
+
+    landmark_index = landmarks.load(directory, graph.num_people)
+    names = NamesView(graph)
+    people = PeopleView(graph)
+    movies = MoviesView(graph)
+
+
+def parse_data(directory, report=None):
+    """
+    Parse the CSV files in directory into a graph, streaming the stars
+    from disk. If report is a dict, counts of malformed and dropped rows
+    are added to it, as for Graph.build.
+    """
+    people = CSVRows(f"{directory}/people.csv", ("id", "name", "birth"))
+    movies = CSVRows(f"{directory}/movies.csv", ("id", "title", "year"))
+    stars = CSVRows(f"{directory}/stars.csv", ("person_id", "movie_id"))
+
+    # Births and years repeat a lot, so share one string for each
+    people_rows = [(person_id, name, sys.intern(birth))
+                   for person_id, name, birth in people]
+    movie_rows = [(movie_id, title, sys.intern(year))
+                  for movie_id, title, year in movies]
+    graph = Graph.build(people_rows, movie_rows, stars, report)
+
+    if report is not None:
+        report["skipped"] = (report.get("skipped", 0) + people.skipped
+                             + movies.skipped + stars.skipped)
+    return graph
+
+
+class CSVRows():
+    """
+    Tuples of the named columns of each row in a CSV file, read from disk
+    in buffered chunks every time the rows are iterated. Rows with the
+    wrong number of fields are skipped, and counted in skipped.
+    """
+
+    # Bytes read from the file at a time
+    BUFFER_SIZE = 1 << 20
+
+    def __init__(self, filename, columns):
+        self.filename = filename
+        self.columns = columns
+        self.skipped = 0
+
+    def __iter__(self):
+        self.skipped = 0
+        with open(self.filename, encoding="utf-8", newline="",
+                  buffering=self.BUFFER_SIZE) as f:
+            reader = csv.reader(f)
+            header = next(reader, [])
+            select = itemgetter(*(header.index(column)
+                                  for column in self.columns))
+            for row in reader:
+                if len(row) != len(header):
+                    if row:
+                        self.skipped += 1
+                    continue
+                yield select(row)
+
+
 def main():
-    if len(sys.argv) > 2:
-        sys.exit("Usage: python degrees.py [directory]")
-    directory = sys.argv[1] if len(sys.argv) == 2 else "large"
+    parser = argparse.ArgumentParser()
+    parser.add_argument("directory", nargs="?", default="large")
+    parser.add_argument("--bidirectional", action="store_true",
+                        help="search from both people at once")
+    parser.add_argument("--estimate", action="store_true",
+                        help="only bound the degrees with the landmark index")
+    parser.add_argument("--iterative", action="store_true",
+                        help="search by iterative deepening, in memory "
+                             "linear in the degrees plus the table; each "
+                             "extra degree multiplies the time by the "
+                             "number of co-stars")
+    parser.add_argument("--max-depth", type=int, default=6,
+                        help="deepest iterative deepening limit to try, "
+                             "which bounds the time for people who are "
+                             "not connected (default: %(default)s)")
+    parser.add_argument("--table-size", type=int, default=1000000,
+                        help="people iterative deepening may remember, "
+                             "about 100 bytes each; 0 remembers no one, "
+                             "so searches revisit people exponentially "
+                             "often (default: %(default)s)")
+    parser.add_argument("--all", action="store_true",
+                        help="count every shortest path and list some")
+    parser.add_argument("--limit", type=int, default=10,
+                        help="most shortest paths to list with --all")
+    parser.add_argument("--stats", action="store_true",
+                        help="write search statistics to stderr as JSON")
+    args = parser.parse_args()
+    if args.stats:
+        instrument.enable()
 
     # Load data from files into memory
     print("Loading data...")
-    load_data(directory)
+    load_data(args.directory)
     print("Data loaded.")
 
     source = person_id_for_name(input("Name: "))
@@ -70,19 +160,47 @@ def main():
     if target is None:
         sys.exit("Person not found.")
 
-    path = shortest_path(source, target)
+    if args.estimate:
+        estimate_degrees(source, target)
+        return
+    if args.all:
+        count = count_shortest_paths(source, target)
+        if count == 0:
+            print("Not connected.")
+            return
+        print(f"{count} shortest paths.")
+        paths = all_shortest_paths(source, target)
+        for number, path in enumerate(islice(paths, args.limit), 1):
+            print(f"Path {number}:")
+            print_path(source, path)
+        return
+    if args.bidirectional:
+        path = bidirectional_shortest_path(source, target)
+    elif args.iterative:
+        path = iterative_deepening_path(
+            source, target, args.max_depth, args.table_size
+        )
+        if path is CUTOFF:
+            print(f"No path within {args.max_depth} degrees.")
+            return
+    else:
+        path = shortest_path(source, target)
 
     if path is None:
         print("Not connected.")
     else:
-        degrees = len(path)
-        print(f"{degrees} degrees of separation.")
-        path = [(None, source)] + path
-        for i in range(degrees):
-            person1 = people[path[i][1]]["name"]
-            person2 = people[path[i + 1][1]]["name"]
-            movie = movies[path[i + 1][0]]["title"]
-            print(f"{i + 1}: {person1} and {person2} starred in {movie}")
+        print_path(source, path)
+
+
+def print_path(source, path):
+    degrees = len(path)
+    print(f"{degrees} degrees of separation.")
+    path = [(None, source)] + path
+    for i in range(degrees):
+        person1 = people[path[i][1]]["name"]
+        person2 = people[path[i + 1][1]]["name"]
+        movie = movies[path[i + 1][0]]["title"]
+        print(f"{i + 1}: {person1} and {person2} starred in {movie}")
 
 
 def shortest_path(source, target):
@@ -92,51 +210,462 @@ def shortest_path(source, target):
 
     If no possible path, returns None.
     """
+    stats = instrument.start(
+        "degrees", source=source, target=target,
+        algorithm="bfs" if landmark_index is None else "landmarks"
+    )
+    source = graph.person_index(source)
+    target = graph.person_index(target)
+    if stats is not None:
+        stats.lap("resolve")
+    if landmark_index is not None:
+        path = landmark_search(source, target, stats)
+    else:
+        path = breadth_first_search(source, target, stats)
+    if stats is not None:
+        stats.lap("search")
+    if path is not None:
+        path = graph.path_ids(path)
+    if stats is not None:
+        stats.lap("convert")
+        stats.finish(path is not None)
+    return path
+
+
+def breadth_first_search(source, target, stats=None):
+    """
+    Returns the shortest list of (movie, person) integer pairs
+    that connect the source to the target in the graph, or None.
+    """
+    if source == target:
+        return []
+
+    # Maps every reached person to the (movie, person) step it was reached by
+    parents = {source: None}
+
+    # A movie only needs expanding once: all of its stars are reached then
+    expanded = bytearray(graph.num_movies)
+
+    queue = deque([source])
+    while queue:
+        if stats is not None:
+            stats.expanded += 1
+            stats.peak_frontier = max(stats.peak_frontier, len(queue))
+        person = queue.popleft()
+        for movie in graph.movies_of(person):
+            if expanded[movie]:
+                continue
+            expanded[movie] = 1
+            if stats is not None:
+                stats.duplicates += count_reached(movie, parents, target)
+            for neighbor in graph.stars_of(movie):
+                if neighbor in parents:
+                    continue
+                parents[neighbor] = (movie, person)
+                if neighbor == target:
+                    if stats is not None:
+                        stats.generated = len(parents)
+                    return trace_path(parents, target)
+                queue.append(neighbor)
+
+    if stats is not None:
+        stats.generated = len(parents)
+    return None
+
+
+def count_reached(movie, reached, target):
+    """
+    Returns how many stars of movie a search will reject as already
+    reached, stopping at target since the search ends there. Counting
+    here, only when instrumented, keeps the search's inner loop as is.
+    """
+    count = 0
+    for person in graph.stars_of(movie):
+        if person == target:
+            break
+        if person in reached:
+            count += 1
+    return count
+
+
+def landmark_search(source, target, stats=None):
+    """
+    Returns the shortest list of (movie, person) integer pairs
+    that connect the source to the target, or None, using A* with the
+    landmark index bounds as heuristic.
+    """
+    if landmark_index.bounds(source, target) is None:
+        return None
+    estimate = landmark_index.heuristic(target)
+
+    depths = {source: 0}
+    parents = {source: None}
+
+    # Smallest depth each movie was expanded at; expanding it again
+    # from a deeper person cannot improve any of its stars
+    expanded = {}
+
+    # Among equal estimates, prefer the deepest person
+    heap = [(estimate(source), 0, source)]
+    if stats is not None:
+        stats.generated = 1
+    while heap:
+        if stats is not None:
+            stats.peak_frontier = max(stats.peak_frontier, len(heap))
+        _, depth, person = heappop(heap)
+        depth = -depth
+        if depth > depths[person]:
+            continue
+        if stats is not None:
+            stats.expanded += 1
+        if person == target:
+            return trace_path(parents, target)
+        for movie in graph.movies_of(person):
+            if expanded.get(movie, depth + 1) <= depth:
+                continue
+            expanded[movie] = depth
+            if stats is not None:
+                stars = graph.stars_of(movie)
+                kept = sum(1 for neighbor in stars
+                           if depths.get(neighbor, depth + 2) <= depth + 1)
+                stats.duplicates += kept
+                stats.generated += len(stars) - kept
+            for neighbor in graph.stars_of(movie):
+                if depth + 1 < depths.get(neighbor, depth + 2):
+                    depths[neighbor] = depth + 1
+                    parents[neighbor] = (movie, person)
+                    heappush(heap, (depth + 1 + estimate(neighbor),
+                                    -(depth + 1), neighbor))
+
+    return None
+
+
+def trace_path(parents, person):
+    """Follows parent steps back from person to the root of a search."""
+    path = []
+    while parents[person] is not None:
+        movie, previous = parents[person]
+        path.append((movie, person))
+        person = previous
+    path.reverse()
+    return path
+
+
+def bidirectional_shortest_path(source, target):
+    """
+    Returns the same kind of path as shortest_path, but grows one
+    breadth-first search from the source and another from the target,
+    always expanding whichever frontier is smaller, until they meet.
+
+    If no possible path, returns None.
+    """
+    source = graph.person_index(source)
+    target = graph.person_index(target)
+    if source == target:
+        return []
+
+    # Maps every reached person to the (movie, person) step that
+    # leads one hop back towards the root of its search
+    forward = {source: None}
+    backward = {target: None}
+    forward_movies = bytearray(graph.num_movies)
+    backward_movies = bytearray(graph.num_movies)
+    forward_layer = [source]
+    backward_layer = [target]
+
+    while forward_layer and backward_layer:
+        if len(forward_layer) <= len(backward_layer):
+            forward_layer, meeting = expand_layer(
+                forward_layer, forward, forward_movies, backward
+            )
+        else:
+            backward_layer, meeting = expand_layer(
+                backward_layer, backward, backward_movies, forward
+            )
+        if meeting is not None:
+            return graph.path_ids(join_paths(meeting, forward, backward))
+
+    return None
+
+
+def expand_layer(layer, reached, expanded, other):
+    """
+    Expands one full BFS layer, recording new people in reached and
+    expanded movies in expanded.
+    Returns the next layer and the first person also reached by the
+    other search, or None if the searches have not met yet.
+    """
+    next_layer = []
+    for person in layer:
+        for movie in graph.movies_of(person):
+            if expanded[movie]:
+                continue
+            expanded[movie] = 1
+            for neighbor in graph.stars_of(movie):
+                if neighbor in reached:
+                    continue
+                reached[neighbor] = (movie, person)
+
+                # Every person reached so far by either side is strictly
+                # closer to its root than this layer, so the first meeting
+                # is optimal
+                if neighbor in other:
+                    return next_layer, neighbor
+                next_layer.append(neighbor)
+    return next_layer, None
+
+
+def join_paths(meeting, forward, backward):
+    """
+    Stitches the forward and backward searches together at meeting into
+    a list of (movie, person) pairs from source to target.
+    """
+    path = trace_path(forward, meeting)
+    person = meeting
+    while backward[person] is not None:
+        movie, following = backward[person]
+        path.append((movie, following))
+        person = following
+    return path
+
+
+def all_shortest_paths(source, target):
+    """
+    Yields every shortest list of (movie_id, person_id) pairs that
+    connects the source to the target, one at a time. Two paths differ
+    if they pass through different people or different movies.
+    """
+    source = graph.person_index(source)
+    target = graph.person_index(target)
+    dag = shortest_path_dag(source, target)
+    if dag is None:
+        return
+    for path in dag_paths(dag, source, target):
+        yield graph.path_ids(path)
 
-    explored = set()
 
-    start = Node(source, None, None)
-    frontier = QueueFrontier()
-    frontier.add(start)
+def count_shortest_paths(source, target):
+    """
+    Returns the number of shortest paths between two people, 0 if they
+    are not connected, without listing the paths.
+    """
+    source = graph.person_index(source)
+    target = graph.person_index(target)
+    dag = shortest_path_dag(source, target)
+    if dag is None:
+        return 0
+
+    # The dag lists people from the target back towards the source, so
+    # reversed, every person comes after all of its predecessors
+    counts = {source: 1}
+    for person in reversed(dag):
+        counts[person] = sum(counts[previous] for _, previous in dag[person])
+    return counts[target]
+
+
+def shortest_path_dag(source, target):
+    """
+    Returns the shortest paths from source to target as a DAG: a dict
+    mapping every person on some shortest path, apart from the source,
+    to the (movie, person) pairs that reach it from one degree closer to
+    the source. People are listed layer by layer from the target back.
+    Returns None if the two people are not connected.
+    """
+    if source == target:
+        return {}
+
+    # Layered BFS from the source, stopping after the target's layer
+    depths = {source: 0}
+    expanded = bytearray(graph.num_movies)
+    layer = [source]
+    depth = 0
+    while layer and target not in depths:
+        depth += 1
+        next_layer = []
+        for person in layer:
+            for movie in graph.movies_of(person):
+                if expanded[movie]:
+                    continue
+                expanded[movie] = 1
+                for neighbor in graph.stars_of(movie):
+                    if neighbor not in depths:
+                        depths[neighbor] = depth
+                        next_layer.append(neighbor)
+        layer = next_layer
+    if target not in depths:
+        return None
+
+    # Walk back from the target, keeping only edges that lose one degree
+    dag = {target: None}
+    layer = [target]
+    for depth in range(depths[target], 0, -1):
+        next_layer = []
+        for person in layer:
+            steps = []
+            for movie in graph.movies_of(person):
+                for previous in graph.stars_of(movie):
+                    if depths.get(previous) != depth - 1:
+                        continue
+                    steps.append((movie, previous))
+                    if previous != source and previous not in dag:
+                        dag[previous] = None
+                        next_layer.append(previous)
+            dag[person] = steps
+        layer = next_layer
+    return dag
+
+
+def dag_paths(dag, source, target):
+    """
+    Yields the paths through a shortest path DAG from source to target
+    as lists of (movie, person) integer pairs, by depth-first search back
+    from the target. Every person in the DAG leads back to the source, so
+    each path takes time proportional to its length.
+    """
+    if source == target:
+        yield []
+        return
+
+    # Steps from the target back, and the people they lead back from
+    path = []
+    people = [target]
+    frames = [iter(dag[target])]
+    while frames:
+        step = next(frames[-1], None)
+        if step is None:
+            frames.pop()
+            people.pop()
+            if path:
+                path.pop()
+            continue
+
+        movie, previous = step
+        path.append((movie, people[-1]))
+        if previous == source:
+            yield path[::-1]
+            path.pop()
+            continue
+        people.append(previous)
+        frames.append(iter(dag[previous]))
+
+
+def iterative_deepening_path(source, target, max_depth=None, table_size=0):
+    """
+    Returns the same kind of path as shortest_path, found by iterative
+    deepening depth-first search so that memory stays linear in the
+    degrees of separation, apart from an optional transposition table
+    of at most table_size people.
 
-    while True:
+    Returns None if the people are not connected, or CUTOFF if no path
+    of at most max_depth degrees is found but there may be a longer one.
+    """
+    path = iterative_deepening_search(
+        graph.person_index(source), graph.person_index(target),
+        max_depth, table_size
+    )
+    if path is None or path is CUTOFF:
+        return path
+    return graph.path_ids(path)
 
-        # If nothing in frontier, then no path
-        if frontier.empty():
-                raise Exception("no solution")
-        
-        node = frontier.remove()
-        if node.state == target:
-            rt = []
 
-            while node.parent is not None:
-                rt.append((node.action, node.state))
-                node = node.parent
-            
-            rt.reverse()
-            return rt
-        explored.add(node.state)
+def iterative_deepening_search(source, target, max_depth=None, table_size=0):
+    """
+    Returns the shortest list of (movie, person) integer pairs
+    that connect the source to the target by running depth-limited
+    searches with limits 1, 2, 3...
 
-        neighbors = neighbors_for_person(node.state)
-        
-        for action, state in neighbors:
-            if state not in explored and not frontier.contains_state(state):
-                child = Node(state, node, action)
-                if state == target:
-                    rt = []
-                    while child.parent is not None:
-                        rt.append((child.action, child.state))
-                        child = child.parent
-                    
-                    rt.reverse()
-                    return rt
-            
-                frontier.add(child)
+    Returns None once a limit reaches no one new, which shows the people
+    are not connected. Without a table, or once it fills up, that cannot
+    be shown, so only max_depth stops the search, returning CUTOFF.
+    """
+    if source == target:
+        return []
+    previous = None
+    limit = 1
+    while max_depth is None or limit <= max_depth:
+        path, reached = depth_limited_search(source, target, limit, table_size)
+        if path is not None:
+            return path
+
+        # No one new within this limit means the search is exhausted
+        if reached is not None and reached == previous:
+            return None
+        previous = reached
+        limit += 1
+    return CUTOFF
+
+
+def depth_limited_search(source, target, limit, table_size):
+    """
+    Searches depth first for target within limit degrees of source,
+    skipping people already on the current path and people the table
+    has seen at no greater depth.
+    Returns (path, reached): the path if found, and the number of people
+    reached, or None if the table was disabled or filled up.
+    """
+    def co_stars(person):
+        for movie in graph.movies_of(person):
+            for neighbor in graph.stars_of(movie):
+                yield movie, neighbor
+
+    path = []
+    on_path = {source}
+    table = {source: 0}
+    saturated = not table_size
+    frames = [co_stars(source)]
+    while frames:
+        step = next(frames[-1], None)
+        if step is None:
+            frames.pop()
+            if path:
+                on_path.discard(path.pop()[1])
+            continue
+
+        movie, person = step
+        if person in on_path:
+            continue
+        if person == target:
+            path.append(step)
+            return path, None
+
+        depth = len(path) + 1
+        if table_size:
+            best = table.get(person)
+            if best is not None and best <= depth:
+                continue
+            if best is not None or len(table) < table_size:
+                table[person] = depth
+            else:
+                saturated = True
 
-          
+        if depth < limit:
+            path.append(step)
+            on_path.add(person)
+            frames.append(co_stars(person))
 
+    return None, None if saturated else len(table)
 
 
+def estimate_degrees(source, target):
+    """
+    Prints bounds on the degrees between two people from the landmark
+    index, without searching.
+    """
+    if landmark_index is None:
+        sys.exit("No landmark index; build one with landmarks.py.")
+    bounds = landmark_index.bounds(
+        graph.person_index(source), graph.person_index(target)
+    )
+    if bounds is None:
+        print("Not connected.")
+        return
+    lower, upper = bounds
+    if upper is None:
+        print(f"At least {lower} degrees of separation, if connected.")
+    elif lower == upper:
+        print(f"{lower} degrees of separation.")
+    else:
+        print(f"Between {lower} and {upper} degrees of separation.")
 
 
 def person_id_for_name(name):
@@ -144,7 +673,13 @@ def person_id_for_name(name):
     Returns the IMDB id for a person's name,
     resolving ambiguities as needed.
     """
+    if not name.strip():
+        return None
     person_ids = list(names.get(name.lower(), set()))
+    if len(person_ids) == 0:
+        person_ids = similar_people(name)
+        if len(person_ids) == 1:
+            print(f"Using {people[person_ids[0]]['name']} for '{name}'.")
     if len(person_ids) == 0:
         return None
     elif len(person_ids) > 1:
@@ -165,16 +700,27 @@ def person_id_for_name(name):
         return person_ids[0]
 
 
+def similar_people(name, limit=5):
+    """
+    Returns the IMDB ids of up to limit people whose names start with
+    name or, failing that, look like a misspelling of it.
+    """
+    matches = graph.people_with_prefix(" ".join(name.lower().split()), limit)
+    if not matches:
+        matches = [person for _, person in graph.people_like(name, limit)]
+    return [graph.person_ids[person] for person in matches]
+
+
 def neighbors_for_person(person_id):
     """
     Returns (movie_id, person_id) pairs for people
     who starred with a given person.
     """
-    movie_ids = people[person_id]["movies"]
     neighbors = set()
-    for movie_id in movie_ids:
-        for person_id in movies[movie_id]["stars"]:
-            neighbors.add((movie_id, person_id))
+    for movie in graph.movies_of(graph.person_index(person_id)):
+        movie_id = graph.movie_ids[movie]
+        for person in graph.stars_of(movie):
+            neighbors.add((movie_id, graph.person_ids[person]))
     return neighbors
 
 
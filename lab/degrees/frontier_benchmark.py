@@ -0,0 +1,80 @@
+import sys
+import time
+
+from util import Node, StackFrontier, QueueFrontier
+
+
+class ListStackFrontier():
+    """
+    The original list-based frontier, kept as a baseline. The same
+    baseline is in src/0-Search/benchmark.py, since each project
+    directory runs on its own.
+    """
+
+    def __init__(self):
+        self.frontier = []
+
+    def add(self, node):
+        self.frontier.append(node)
+
+    def contains_state(self, state):
+        return any(node.state == state for node in self.frontier)
+
+    def empty(self):
+        return len(self.frontier) == 0
+
+    def remove(self):
+        if self.empty():
+            raise Exception("empty frontier")
+        else:
+            node = self.frontier[-1]
+            self.frontier = self.frontier[:-1]
+            return node
+
+
+class ListQueueFrontier(ListStackFrontier):
+
+    def remove(self):
+        if self.empty():
+            raise Exception("empty frontier")
+        else:
+            node = self.frontier[0]
+            self.frontier = self.frontier[1:]
+            return node
+
+
+def workload(frontier_class, n):
+    """
+    Fills a frontier with n nodes, checking membership before every add
+    the way the search loops do, then drains it.
+    Returns the elapsed time in seconds.
+    """
+    frontier = frontier_class()
+    start = time.perf_counter()
+    for state in range(n):
+        if not frontier.contains_state(state):
+            frontier.add(Node(state, None, None))
+    while not frontier.empty():
+        frontier.remove()
+    return time.perf_counter() - start
+
+
+def main():
+    if len(sys.argv) > 2:
+        sys.exit("Usage: python frontier_benchmark.py [n]")
+    n = int(sys.argv[1]) if len(sys.argv) == 2 else 5000
+
+    pairs = [
+        ("stack", ListStackFrontier, StackFrontier),
+        ("queue", ListQueueFrontier, QueueFrontier)
+    ]
+    print(f"{n} nodes")
+    for name, baseline, frontier in pairs:
+        old = workload(baseline, n)
+        new = workload(frontier, n)
+        print(f"{name}: list {old:.4f}s, deque {new:.4f}s, "
+              f"speedup {old / new:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,424 @@
+from array import array
+from bisect import bisect_left
+from collections.abc import Mapping
+from heapq import nlargest
+from math import ceil
+from operator import itemgetter
+
+# Sorts after every character that appears in names
+LAST_CHARACTER = chr(0x10FFFF)
+
+
+class Graph():
+    """
+    Bipartite graph of people and the movies they starred in.
+
+    People and movies are interned to dense integers in sorted IMDb id
+    order, so person p is person_ids[p] and lookups by id are a binary
+    search. Star edges are stored in both directions as CSR arrays:
+    the movies of person p are
+        person_movies[person_offsets[p]:person_offsets[p + 1]]
+    and the stars of movie m are
+        movie_people[movie_offsets[m]:movie_offsets[m + 1]].
+    name_order lists every person sorted by lowercased name, and the
+    people whose names contain the trigram trigrams[t] are
+        trigram_people[trigram_offsets[t]:trigram_offsets[t + 1]].
+
+    The id and name tables may be lists or any other sequence of strings,
+    and the integer arrays may be arrays or memoryviews, so a graph can
+    be backed directly by a memory-mapped snapshot.
+    """
+
+    def __init__(self, person_ids, person_names, person_births,
+                 movie_ids, movie_titles, movie_years,
+                 person_offsets, person_movies, movie_offsets, movie_people,
+                 name_order, trigrams, trigram_offsets, trigram_people):
+        self.person_ids = person_ids
+        self.person_names = person_names
+        self.person_births = person_births
+        self.movie_ids = movie_ids
+        self.movie_titles = movie_titles
+        self.movie_years = movie_years
+        self.person_offsets = person_offsets
+        self.person_movies = person_movies
+        self.movie_offsets = movie_offsets
+        self.movie_people = movie_people
+        self.name_order = name_order
+        self.trigrams = trigrams
+        self.trigram_offsets = trigram_offsets
+        self.trigram_people = trigram_people
+
+    @classmethod
+    def build(cls, people_rows, movie_rows, star_rows, report=None):
+        """
+        Builds a graph from (id, name, birth) people rows,
+        (id, title, year) movie rows and (person_id, movie_id) star rows.
+
+        star_rows is read twice, once to count each person's and movie's
+        stars and once to fill them in, so that it can be streamed from
+        disk and the adjacency is never held in more than its final size.
+        Only the first row for an id, and one copy of a repeated star row,
+        is kept. Star rows that refer to unknown people or movies are
+        ignored. If report is a dict, the number of rows dropped for each
+        reason is added to its "skipped", "dangling" and "duplicates".
+        """
+        people_rows, skipped_people = unique_rows(people_rows)
+        movie_rows, skipped_movies = unique_rows(movie_rows)
+        person_ids = [row[0] for row in people_rows]
+        movie_ids = [row[0] for row in movie_rows]
+
+        # Count stars, then turn the counts into offsets
+        person_offsets = array("i", bytes(4 * (len(person_ids) + 1)))
+        movie_offsets = array("i", bytes(4 * (len(movie_ids) + 1)))
+        dangling = 0
+        for person, movie in resolve_stars(star_rows, person_ids, movie_ids):
+            if person is None or movie is None:
+                dangling += 1
+                continue
+            person_offsets[person + 1] += 1
+            movie_offsets[movie + 1] += 1
+        for offsets in (person_offsets, movie_offsets):
+            for i in range(len(offsets) - 1):
+                offsets[i + 1] += offsets[i]
+
+        # Fill in both directions in one more pass over the stars
+        person_movies = array("i", bytes(4 * person_offsets[-1]))
+        movie_people = array("i", bytes(4 * movie_offsets[-1]))
+        person_position = person_offsets[:-1]
+        movie_position = movie_offsets[:-1]
+        for person, movie in resolve_stars(star_rows, person_ids, movie_ids):
+            if person is None or movie is None:
+                continue
+            person_movies[person_position[person]] = movie
+            person_position[person] += 1
+            movie_people[movie_position[movie]] = person
+            movie_position[movie] += 1
+        if (person_position != person_offsets[1:]
+                or movie_position != movie_offsets[1:]):
+            raise Exception("star rows changed while building the graph")
+
+        duplicates = remove_repeats(person_offsets, person_movies)
+        remove_repeats(movie_offsets, movie_people)
+        if report is not None:
+            report["skipped"] = (report.get("skipped", 0)
+                                 + skipped_people + skipped_movies)
+            report["dangling"] = report.get("dangling", 0) + dangling
+            report["duplicates"] = report.get("duplicates", 0) + duplicates
+
+        person_names = [row[1] for row in people_rows]
+        name_order = array("i", sorted(
+            range(len(people_rows)), key=lambda p: person_names[p].lower()
+        ))
+        trigram_list, trigram_offsets, trigram_people = build_trigrams(
+            person_names
+        )
+        return cls(
+            person_ids,
+            person_names,
+            [row[2] for row in people_rows],
+            movie_ids,
+            [row[1] for row in movie_rows],
+            [row[2] for row in movie_rows],
+            person_offsets, person_movies, movie_offsets, movie_people,
+            name_order, trigram_list, trigram_offsets, trigram_people
+        )
+
+    @property
+    def num_people(self):
+        return len(self.person_ids)
+
+    @property
+    def num_movies(self):
+        return len(self.movie_ids)
+
+    def person_index(self, person_id):
+        """Returns the integer for an IMDb person id, or None."""
+        return find(self.person_ids, person_id)
+
+    def movie_index(self, movie_id):
+        """Returns the integer for an IMDb movie id, or None."""
+        return find(self.movie_ids, movie_id)
+
+    def people_named(self, name):
+        """Returns the people whose lowercased name is name."""
+        order, names = self.name_order, self.person_names
+        start = bisect_names(order, names, name)
+        end = bisect_names(order, names, name, right=True, lo=start)
+        return order[start:end]
+
+    def people_with_prefix(self, prefix, limit=10):
+        """
+        Returns up to limit people whose lowercased name starts with
+        prefix, those in the most movies first.
+        """
+        order, names = self.name_order, self.person_names
+        start = bisect_names(order, names, prefix)
+        end = bisect_names(order, names, prefix + LAST_CHARACTER, lo=start)
+        return nlargest(limit, order[start:end], key=self.movie_count)
+
+    def people_like(self, name, limit=10, threshold=0.4):
+        """
+        Returns up to limit (similarity, person) pairs for the people whose
+        names are most like name, those in the most movies first among
+        equally similar names. Similarity is the Jaccard index of the
+        names' trigram sets, and must be at least threshold.
+        """
+        query = trigrams(name)
+        offsets = self.trigram_offsets
+        postings = []
+        for trigram in query:
+            t = find(self.trigrams, trigram)
+            if t is None:
+                postings.append(())
+            else:
+                postings.append(self.trigram_people[offsets[t]:offsets[t + 1]])
+
+        # A similar enough name shares at least needed trigrams with the
+        # query, so it must be in one of the shortest len(query) - needed + 1
+        # posting lists. Postings are in person order, so membership of the
+        # other lists can be checked by binary search.
+        needed = max(1, ceil(threshold * len(query)))
+        postings.sort(key=len)
+        split = len(query) - needed + 1
+        hits = {}
+        for posting in postings[:split]:
+            for person in posting:
+                hits[person] = hits.get(person, 0) + 1
+
+        matches = []
+        for person, shared in hits.items():
+            misses = split - shared
+            for posting in postings[split:]:
+                i = bisect_left(posting, person)
+                if i < len(posting) and posting[i] == person:
+                    shared += 1
+                else:
+                    misses += 1
+                    if misses > len(query) - needed:
+                        break
+            if shared < needed:
+                continue
+            size = len(trigrams(self.person_names[person]))
+            similarity = shared / (len(query) + size - shared)
+            if similarity >= threshold:
+                matches.append((similarity, self.movie_count(person), person))
+        return [(similarity, person)
+                for similarity, _, person in nlargest(limit, matches)]
+
+    def movie_count(self, person):
+        """Returns how many movies person starred in."""
+        offsets = self.person_offsets
+        return offsets[person + 1] - offsets[person]
+
+    def movies_of(self, person):
+        """Returns the movies person starred in."""
+        offsets = self.person_offsets
+        return self.person_movies[offsets[person]:offsets[person + 1]]
+
+    def stars_of(self, movie):
+        """Returns the people who starred in movie."""
+        offsets = self.movie_offsets
+        return self.movie_people[offsets[movie]:offsets[movie + 1]]
+
+    def path_ids(self, path):
+        """
+        Converts a list of (movie, person) integer pairs
+        into (movie_id, person_id) IMDb id pairs.
+        """
+        return [(self.movie_ids[movie], self.person_ids[person])
+                for movie, person in path]
+
+
+def find(ids, key):
+    """Binary searches a sorted id sequence, returning the index or None."""
+    i = bisect_left(ids, key)
+    if i < len(ids) and ids[i] == key:
+        return i
+    return None
+
+
+def bisect_names(order, names, name, right=False, lo=0):
+    """
+    Binary searches people sorted by lowercased name, returning where
+    name would be inserted: before any equal names, or after them if
+    right. Works like bisect with key=, which needs Python 3.10.
+    """
+    hi = len(order)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        current = names[order[mid]].lower()
+        if current < name or (right and current == name):
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo
+
+
+def trigrams(name):
+    """
+    Returns the set of three-character substrings of a lowercased name,
+    padded so that the start and end of the name count as well.
+    """
+    padded = f"  {' '.join(name.lower().split())} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def build_trigrams(names):
+    """
+    Indexes names by trigram in two passes, like the stars.
+    Returns a sorted list of trigrams and the (offsets, people) arrays
+    listing the people whose names contain each one.
+    """
+    counts = {}
+    for name in names:
+        for trigram in trigrams(name):
+            counts[trigram] = counts.get(trigram, 0) + 1
+
+    trigram_list = sorted(counts)
+    offsets = array("i", [0])
+    position = {}
+    for trigram in trigram_list:
+        position[trigram] = offsets[-1]
+        offsets.append(offsets[-1] + counts[trigram])
+
+    people = array("i", bytes(4 * offsets[-1]))
+    for person, name in enumerate(names):
+        for trigram in trigrams(name):
+            people[position[trigram]] = person
+            position[trigram] += 1
+    return trigram_list, offsets, people
+
+
+def resolve_stars(star_rows, person_ids, movie_ids):
+    """
+    Yields the (person, movie) integers of each star row, either of which
+    may be None if unknown. Rows for the same person are usually together,
+    so a person's id is only looked up again when it changes.
+    """
+    last_id = None
+    person = None
+    for person_id, movie_id in star_rows:
+        if person_id != last_id:
+            person = find(person_ids, person_id)
+            last_id = person_id
+        yield person, find(movie_ids, movie_id)
+
+
+def unique_rows(rows):
+    """
+    Sorts rows by id, keeping the first row read for each id.
+    Returns the kept rows and the number dropped.
+    """
+    rows = sorted(rows, key=itemgetter(0))
+    kept = [row for i, row in enumerate(rows)
+            if i == 0 or row[0] != rows[i - 1][0]]
+    return kept, len(rows) - len(kept)
+
+
+def remove_repeats(offsets, adjacency):
+    """
+    Drops repeated entries from each adjacency list of a CSR structure
+    in place, keeping the first of each. Returns how many were dropped.
+    """
+    removed = 0
+    start = offsets[0]
+    for i in range(len(offsets) - 1):
+        end = offsets[i + 1]
+        items = adjacency[start:end]
+        unique = dict.fromkeys(items)
+        if removed or len(unique) < len(items):
+            adjacency[start - removed:start - removed + len(unique)] = (
+                array("i", unique)
+            )
+            removed += len(items) - len(unique)
+        offsets[i + 1] = end - removed
+        start = end
+    if removed:
+        del adjacency[len(adjacency) - removed:]
+    return removed
+
+
+class PeopleView(Mapping):
+    """
+    Read-only view of a graph's people, shaped like the original
+    people dict: person_id -> {"name", "birth", "movies"}.
+    """
+
+    def __init__(self, graph):
+        self.graph = graph
+
+    def __getitem__(self, person_id):
+        graph = self.graph
+        person = graph.person_index(person_id)
+        if person is None:
+            raise KeyError(person_id)
+        return {
+            "name": graph.person_names[person],
+            "birth": graph.person_births[person],
+            "movies": {graph.movie_ids[movie]
+                       for movie in graph.movies_of(person)}
+        }
+
+    def __iter__(self):
+        return iter(self.graph.person_ids)
+
+    def __len__(self):
+        return self.graph.num_people
+
+
+class MoviesView(Mapping):
+    """
+    Read-only view of a graph's movies, shaped like the original
+    movies dict: movie_id -> {"title", "year", "stars"}.
+    """
+
+    def __init__(self, graph):
+        self.graph = graph
+
+    def __getitem__(self, movie_id):
+        graph = self.graph
+        movie = graph.movie_index(movie_id)
+        if movie is None:
+            raise KeyError(movie_id)
+        return {
+            "title": graph.movie_titles[movie],
+            "year": graph.movie_years[movie],
+            "stars": {graph.person_ids[person]
+                      for person in graph.stars_of(movie)}
+        }
+
+    def __iter__(self):
+        return iter(self.graph.movie_ids)
+
+    def __len__(self):
+        return self.graph.num_movies
+
+
+class NamesView(Mapping):
+    """
+    Read-only view of a graph's names, shaped like the original
+    names dict: lowercased name -> set of person_ids.
+    """
+
+    def __init__(self, graph):
+        self.graph = graph
+
+    def __getitem__(self, name):
+        graph = self.graph
+        person_ids = {graph.person_ids[person]
+                      for person in graph.people_named(name)}
+        if not person_ids:
+            raise KeyError(name)
+        return person_ids
+
+    def __iter__(self):
+        names = self.graph.person_names
+        previous = None
+        for person in self.graph.name_order:
+            name = names[person].lower()
+            if name != previous:
+                yield name
+                previous = name
+
+    def __len__(self):
+        return sum(1 for _ in self)
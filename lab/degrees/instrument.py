@@ -0,0 +1,85 @@
+import json
+import sys
+import time
+
+# Callable that receives one record per instrumented search,
+# or None while instrumentation is disabled
+sink = None
+
+
+def enable(callback=None):
+    """
+    Starts recording searches, passing each record to callback,
+    or writing it as a JSON line to stderr if no callback is given.
+    """
+    global sink
+    sink = callback if callback is not None else write_record
+
+
+def disable():
+    global sink
+    sink = None
+
+
+def write_record(record):
+    print(json.dumps(record), file=sys.stderr)
+
+
+def start(solver, **query):
+    """
+    Returns a SearchStats for one search, or None if instrumentation is
+    disabled, so that searches only pay for a None check when it is off.
+    """
+    if sink is None:
+        return None
+    return SearchStats(solver, query)
+
+
+class SearchStats():
+    """
+    Cost counters for one search query:
+    - expanded: nodes taken from the frontier and expanded
+    - generated: nodes added to the frontier
+    - peak_frontier: largest the frontier grew
+    - duplicates: neighbors rejected as already seen
+    - phases: wall time in seconds of each named phase
+    A counter the solver does not track is None.
+    """
+
+    def __init__(self, solver, query):
+        self.solver = solver
+        self.query = query
+        self.expanded = 0
+        self.generated = 0
+        self.peak_frontier = 0
+        self.duplicates = 0
+        self.phases = {}
+        self.last = time.perf_counter()
+
+    def lap(self, phase):
+        """Charges the time since the previous lap to phase."""
+        now = time.perf_counter()
+        self.phases[phase] = self.phases.get(phase, 0) + now - self.last
+        self.last = now
+
+    def record(self, found):
+        return {
+            "solver": self.solver,
+            "query": self.query,
+            "found": found,
+            "expanded": self.expanded,
+            "generated": self.generated,
+            "peak_frontier": self.peak_frontier,
+            "duplicates": self.duplicates,
+            "phases": self.phases
+        }
+
+    def finish(self, found, **counters):
+        """
+        Sets the final counters and sends this search's record
+        to the sink, if instrumentation is still enabled.
+        """
+        for name, value in counters.items():
+            setattr(self, name, value)
+        if sink is not None:
+            sink(self.record(found))
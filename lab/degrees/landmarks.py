@@ -0,0 +1,165 @@
+import argparse
+import os
+
+from array import array
+
+import snapshot
+
+FILENAME = "landmarks.bin"
+
+# Distances are stored as single bytes; larger ones are clamped to FAR
+UNREACHABLE = 255
+FAR = 254
+
+
+class LandmarkIndex():
+    """
+    Breadth-first distances from a few well-connected landmark people to
+    every person. By the triangle inequality, for any landmark k
+        |d(k, a) - d(k, b)| <= d(a, b) <= d(k, a) + d(k, b)
+    which bounds the degrees between two people without searching and
+    gives an admissible, consistent heuristic for A*.
+    """
+
+    def __init__(self, landmarks, rows):
+        self.landmarks = landmarks
+        # rows[k][person] is the distance from landmark k to person
+        self.rows = rows
+
+    @classmethod
+    def build(cls, graph, k=16):
+        """Builds an index over the k people with the most movies."""
+        offsets = graph.person_offsets
+        landmarks = sorted(
+            range(graph.num_people),
+            key=lambda person: offsets[person + 1] - offsets[person],
+            reverse=True
+        )[:k]
+        return cls(
+            array("i", landmarks),
+            [distances_from(graph, landmark) for landmark in landmarks]
+        )
+
+    def bounds(self, source, target):
+        """
+        Returns (lower, upper) bounds on the degrees between two people,
+        where upper is None if no landmark gives one.
+        Returns None if the two people are known not to be connected.
+        """
+        lower = 0
+        upper = None
+        for row in self.rows:
+            a, b = row[source], row[target]
+            if a == UNREACHABLE and b == UNREACHABLE:
+                continue
+            if a == UNREACHABLE or b == UNREACHABLE:
+                return None
+            lower = max(lower, abs(a - b))
+            if a != FAR and b != FAR and (upper is None or a + b < upper):
+                upper = a + b
+        if source == target:
+            upper = 0
+        return lower, upper
+
+    def heuristic(self, target):
+        """
+        Returns a function estimating the degrees from a person to target,
+        valid for people connected to target.
+        """
+        pairs = [(row, row[target]) for row in self.rows
+                 if row[target] != UNREACHABLE]
+
+        def estimate(person):
+            best = 0
+            for row, distance in pairs:
+                difference = row[person] - distance
+                if difference < 0:
+                    difference = -difference
+                if difference > best:
+                    best = difference
+            return best
+
+        return estimate
+
+
+def distances_from(graph, source):
+    """
+    Returns a bytearray of the degrees from source to every person,
+    clamped to FAR, or UNREACHABLE if they are not connected.
+    """
+    distances = bytearray([UNREACHABLE]) * graph.num_people
+    expanded = bytearray(graph.num_movies)
+    distances[source] = 0
+    layer = [source]
+    depth = 0
+    while layer:
+        depth = min(depth + 1, FAR)
+        next_layer = []
+        for person in layer:
+            for movie in graph.movies_of(person):
+                if expanded[movie]:
+                    continue
+                expanded[movie] = 1
+                for neighbor in graph.stars_of(movie):
+                    if distances[neighbor] == UNREACHABLE:
+                        distances[neighbor] = depth
+                        next_layer.append(neighbor)
+        layer = next_layer
+    return distances
+
+
+def save(index, directory):
+    """Writes index next to the dataset in directory."""
+    snapshot.write_sections(
+        os.path.join(directory, FILENAME),
+        snapshot.signature(directory),
+        {
+            "landmarks": index.landmarks,
+            "distances": b"".join(index.rows)
+        }
+    )
+
+
+def load(directory, num_people):
+    """
+    Returns the memory-mapped index stored next to the dataset in
+    directory, or None if there is none, it is out of date, or it does
+    not hold a distance for each of num_people people.
+    """
+    sections = snapshot.read_sections(
+        os.path.join(directory, FILENAME), snapshot.signature(directory)
+    )
+    if sections is None:
+        return None
+    landmarks = sections.get("landmarks")
+    distances = sections.get("distances")
+    if landmarks is None or distances is None:
+        return None
+    if len(distances) != len(landmarks) * num_people:
+        return None
+    if any(not 0 <= landmark < num_people for landmark in landmarks):
+        return None
+    rows = [distances[i * num_people:(i + 1) * num_people]
+            for i in range(len(landmarks))]
+    return LandmarkIndex(landmarks, rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Build the landmark distance index for a dataset."
+    )
+    parser.add_argument("directory", nargs="?", default="large")
+    parser.add_argument("-k", type=int, default=16,
+                        help="number of landmarks")
+    args = parser.parse_args()
+
+    import degrees
+    print("Loading data...")
+    degrees.load_data(args.directory)
+    print(f"Building {args.k} landmarks...")
+    save(LandmarkIndex.build(degrees.graph, args.k), args.directory)
+    print(f"Saved {os.path.join(args.directory, FILENAME)}.")
+
+
+if __name__ == "__main__":
+    main()
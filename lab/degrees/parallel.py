@@ -0,0 +1,171 @@
+import argparse
+import os
+import random
+import sys
+import time
+
+from multiprocessing import Pool
+from multiprocessing.shared_memory import SharedMemory
+
+# The graph's CSR arrays, in the order they are shared
+ARRAYS = ("person_offsets", "person_movies", "movie_offsets", "movie_people")
+
+# In a worker process, the shared memory block and the CSR arrays in it
+shared = None
+adjacency = None
+
+
+def count_distances(adjacency, seeds):
+    """
+    Runs a breadth-first search from each seed over the CSR arrays
+    (person_offsets, person_movies, movie_offsets, movie_people).
+    Returns a list whose element d counts the people found at d degrees,
+    summed over all seeds.
+    """
+    person_offsets, person_movies, movie_offsets, movie_people = adjacency
+    num_people = len(person_offsets) - 1
+    num_movies = len(movie_offsets) - 1
+
+    counts = []
+    for source in seeds:
+        reached = bytearray(num_people)
+        expanded = bytearray(num_movies)
+        reached[source] = 1
+        layer = [source]
+        depth = 0
+        while layer:
+            if depth == len(counts):
+                counts.append(0)
+            counts[depth] += len(layer)
+            next_layer = []
+            for person in layer:
+                start, end = person_offsets[person], person_offsets[person + 1]
+                for movie in person_movies[start:end]:
+                    if expanded[movie]:
+                        continue
+                    expanded[movie] = 1
+                    start, end = movie_offsets[movie], movie_offsets[movie + 1]
+                    for neighbor in movie_people[start:end]:
+                        if not reached[neighbor]:
+                            reached[neighbor] = 1
+                            next_layer.append(neighbor)
+            layer = next_layer
+            depth += 1
+    return counts
+
+
+def share(graph):
+    """
+    Copies the graph's CSR arrays into a new shared memory block.
+    Returns the block and the (offset, length) of each array in it;
+    the caller must close and unlink the block.
+    """
+    views = [memoryview(getattr(graph, name)).cast("B") for name in ARRAYS]
+    block = SharedMemory(create=True, size=max(1, sum(map(len, views))))
+    layout = []
+    offset = 0
+    for view in views:
+        block.buf[offset:offset + len(view)] = view
+        layout.append((offset, len(view) // 4))
+        offset += len(view)
+    return block, layout
+
+
+def attach(name, layout):
+    """Maps the shared CSR arrays into a worker process."""
+    global shared, adjacency
+    shared = SharedMemory(name=name)
+    buffer = shared.buf
+    adjacency = tuple(
+        buffer[offset:offset + 4 * length].cast("i")
+        for offset, length in layout
+    )
+
+
+def work(seeds):
+    return count_distances(adjacency, seeds)
+
+
+def distance_histogram(graph, seeds, processes=None, chunk_size=None):
+    """
+    Returns the summed distance histogram of full breadth-first searches
+    from each seed person, as a list indexed by degrees.
+
+    The searches are spread over a pool of processes, all reading one
+    copy of the graph in shared memory. Seeds are handed out in chunks of
+    chunk_size, and each chunk comes back as a single histogram.
+    """
+    seeds = list(seeds)
+    if processes is None:
+        processes = os.cpu_count() or 1
+    if processes == 1 or len(seeds) <= 1:
+        return count_distances(
+            tuple(getattr(graph, name) for name in ARRAYS), seeds
+        )
+    if chunk_size is None:
+        chunk_size = max(1, len(seeds) // (4 * processes))
+    chunks = [seeds[i:i + chunk_size]
+              for i in range(0, len(seeds), chunk_size)]
+
+    block, layout = share(graph)
+    try:
+        with Pool(processes, attach, (block.name, layout)) as pool:
+            total = []
+            for counts in pool.imap_unordered(work, chunks):
+                if len(counts) > len(total):
+                    total.extend([0] * (len(counts) - len(total)))
+                for depth, count in enumerate(counts):
+                    total[depth] += count
+    finally:
+        block.close()
+        block.unlink()
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Count how many people are each number of degrees "
+                    "away from a set of seed people, searching from the "
+                    "seeds in parallel."
+    )
+    parser.add_argument("directory", nargs="?", default="large")
+    parser.add_argument("--seeds", type=int, default=1000,
+                        help="number of random seed people")
+    parser.add_argument("--seed-file",
+                        help="file of seed person ids, one per line, "
+                             "instead of random seeds")
+    parser.add_argument("--random-seed", type=int, default=0)
+    parser.add_argument("--processes", type=int,
+                        help="worker processes, by default one per core")
+    args = parser.parse_args()
+
+    import degrees
+    degrees.load_data(args.directory)
+    graph = degrees.graph
+
+    if args.seed_file is not None:
+        with open(args.seed_file, encoding="utf-8") as f:
+            person_ids = [line.strip() for line in f if line.strip()]
+        seeds = [graph.person_index(person_id) for person_id in person_ids]
+        if None in seeds:
+            sys.exit(f"Unknown person {person_ids[seeds.index(None)]}")
+    else:
+        rng = random.Random(args.random_seed)
+        seeds = rng.sample(range(graph.num_people),
+                           min(args.seeds, graph.num_people))
+
+    start = time.perf_counter()
+    counts = distance_histogram(graph, seeds, args.processes)
+    elapsed = time.perf_counter() - start
+
+    for depth, count in enumerate(counts):
+        print(f"{depth}\t{count}")
+    print(f"unreachable\t{len(seeds) * graph.num_people - sum(counts)}")
+
+    rate = len(seeds) / elapsed if elapsed > 0 else float("inf")
+    print(f"{len(seeds)} searches in {elapsed:.2f}s "
+          f"({rate:.1f} searches/sec)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
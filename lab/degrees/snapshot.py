@@ -0,0 +1,186 @@
+import json
+import mmap
+import os
+import struct
+
+from array import array
+from collections.abc import Sequence
+
+from graph import Graph
+
+MAGIC = b"DEGREES\0"
+VERSION = 2
+FILENAME = "degrees.snapshot"
+SOURCES = ("people.csv", "movies.csv", "stars.csv")
+
+# Magic, version and header length
+PREAMBLE = struct.Struct("<8sII")
+
+STRING_TABLES = (
+    "person_ids", "person_names", "person_births",
+    "movie_ids", "movie_titles", "movie_years", "trigrams"
+)
+ARRAYS = (
+    "person_offsets", "person_movies", "movie_offsets", "movie_people",
+    "name_order", "trigram_offsets", "trigram_people"
+)
+
+
+class StringTable(Sequence):
+    """
+    Sequence of strings stored as one UTF-8 blob plus an offsets array,
+    so that it can be read straight out of a memory-mapped file.
+    """
+
+    def __init__(self, offsets, data):
+        self.offsets = offsets
+        self.data = data
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("string table index out of range")
+        return str(self.data[self.offsets[i]:self.offsets[i + 1]], "utf-8")
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+
+def encode_strings(strings):
+    """Returns (offsets, data) encoding a sequence of strings."""
+    offsets = array("q", [0])
+    chunks = []
+    size = 0
+    for string in strings:
+        chunk = string.encode("utf-8")
+        chunks.append(chunk)
+        size += len(chunk)
+        offsets.append(size)
+    return offsets, b"".join(chunks)
+
+
+def signature(directory, sources=SOURCES):
+    """
+    Returns the size and modification time of each source file,
+    which a snapshot must match to be considered up to date.
+    """
+    result = {}
+    for name in sources:
+        stat = os.stat(os.path.join(directory, name))
+        result[name] = [stat.st_size, stat.st_mtime_ns]
+    return result
+
+
+def write_sections(path, sources, sections):
+    """
+    Writes a snapshot file holding the given sections, a dict mapping
+    names to arrays or bytes, tagged with the sources signature.
+    The file is written to a temporary name first and then moved into
+    place, so readers never see a partial snapshot.
+    """
+    layout = {}
+    offset = 0
+    for name, section in sections.items():
+        section = memoryview(section)
+        layout[name] = [offset, section.nbytes, section.format]
+        offset = align(offset + section.nbytes)
+
+    header = json.dumps({
+        "sources": sources,
+        "sections": layout
+    }).encode("utf-8")
+    start = align(PREAMBLE.size + len(header))
+
+    temporary = f"{path}.tmp"
+    with open(temporary, "wb") as f:
+        f.write(PREAMBLE.pack(MAGIC, VERSION, len(header)))
+        f.write(header)
+        for name, section in sections.items():
+            f.seek(start + layout[name][0])
+            f.write(section)
+        f.truncate(start + offset)
+    os.replace(temporary, path)
+
+
+def read_sections(path, sources):
+    """
+    Memory-maps a snapshot file and returns a dict mapping section names
+    to memoryviews, or None if the file is missing, from another version,
+    built from different sources, or truncated or corrupted.
+    """
+    try:
+        with open(path, "rb") as f:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+
+    view = memoryview(data)
+    if len(view) < PREAMBLE.size:
+        return None
+    magic, version, length = PREAMBLE.unpack_from(view)
+    if magic != MAGIC or version != VERSION:
+        return None
+    try:
+        header = view[PREAMBLE.size:PREAMBLE.size + length]
+        header = json.loads(str(header, "utf-8"))
+        if header["sources"] != sources:
+            return None
+
+        start = align(PREAMBLE.size + length)
+        sections = {}
+        for name, (offset, size, typecode) in header["sections"].items():
+            section = view[start + offset:start + offset + size]
+            if len(section) != size:
+                raise ValueError(f"section {name} is truncated")
+            if typecode != "B":
+                section = section.cast(typecode)
+            sections[name] = section
+    except (AttributeError, KeyError, TypeError, ValueError):
+        return None
+    return sections
+
+
+def save_graph(graph, directory):
+    """Writes a snapshot of graph next to the CSV files in directory."""
+    sections = {}
+    for name in STRING_TABLES:
+        offsets, data = encode_strings(getattr(graph, name))
+        sections[f"{name}.offsets"] = offsets
+        sections[f"{name}.data"] = data
+    for name in ARRAYS:
+        sections[name] = getattr(graph, name)
+    write_sections(
+        os.path.join(directory, FILENAME), signature(directory), sections
+    )
+
+
+def load_graph(directory):
+    """
+    Returns the graph stored in directory's snapshot, backed by the
+    memory-mapped file, or None if there is no up-to-date snapshot.
+    """
+    sections = read_sections(
+        os.path.join(directory, FILENAME), signature(directory)
+    )
+    if sections is None:
+        return None
+    fields = {}
+    try:
+        for name in STRING_TABLES:
+            fields[name] = StringTable(
+                sections[f"{name}.offsets"], sections[f"{name}.data"]
+            )
+        for name in ARRAYS:
+            fields[name] = sections[name]
+    except KeyError:
+        return None
+    return Graph(**fields)
+
+
+def align(offset, boundary=8):
+    """Rounds offset up to a multiple of boundary."""
+    return -(-offset // boundary) * boundary
@@ -0,0 +1,155 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from generate import generate, GENERATORS
+from grid import GridMaze, NoSolution
+from maze import Maze, ALGORITHMS
+
+
+class ListStackFrontier():
+    """
+    The original list-based frontier, kept as a baseline. The same
+    baseline is in lab/degrees/frontier_benchmark.py, since each project
+    directory runs on its own.
+    """
+
+    def __init__(self):
+        self.frontier = []
+
+    def add(self, node):
+        self.frontier.append(node)
+
+    def contains_state(self, state):
+        return any(node.state == state for node in self.frontier)
+
+    def empty(self):
+        return len(self.frontier) == 0
+
+    def remove(self):
+        if self.empty():
+            raise Exception("empty frontier")
+        else:
+            node = self.frontier[-1]
+            self.frontier = self.frontier[:-1]
+            return node
+
+
+class ListQueueFrontier(ListStackFrontier):
+
+    def remove(self):
+        if self.empty():
+            raise Exception("empty frontier")
+        else:
+            node = self.frontier[0]
+            self.frontier = self.frontier[1:]
+            return node
+
+
+class ListMaze(Maze):
+    """Maze whose uninformed searches use the list-based frontiers."""
+
+    def frontier(self, algorithm, heuristic):
+        if algorithm == "dfs":
+            return ListStackFrontier()
+        if algorithm == "bfs":
+            return ListQueueFrontier()
+        return super().frontier(algorithm, heuristic)
+
+
+# Solver name -> (maze class, algorithm)
+SOLVERS = {algorithm: (Maze, algorithm) for algorithm in ALGORITHMS}
+SOLVERS.update({
+    "dfs-list": (ListMaze, "dfs"),
+    "bfs-list": (ListMaze, "bfs"),
+    "compact": (GridMaze, None)
+})
+
+
+def measure(filename, solver):
+    """
+    Solves the maze in filename with solver twice: once for wall time
+    and once under tracemalloc for peak memory.
+    Returns a dict of the measurements.
+    """
+    maze_class, algorithm = SOLVERS[solver]
+    arguments = () if algorithm is None else (algorithm,)
+
+    maze = maze_class(filename)
+    start = time.perf_counter()
+    try:
+        maze.solve(*arguments)
+    except NoSolution:
+        return {"solved": False}
+    seconds = time.perf_counter() - start
+
+    maze = maze_class(filename)
+    tracemalloc.start()
+    maze.solve(*arguments)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {
+        "solved": True,
+        "seconds": seconds,
+        "peak_bytes": peak,
+        "explored": maze.num_explored,
+        "length": len(maze.solution[0])
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark maze solvers on generated mazes, writing "
+                    "one JSON record per run."
+    )
+    parser.add_argument("--generators", nargs="+", choices=sorted(GENERATORS),
+                        default=sorted(GENERATORS))
+    parser.add_argument("--sizes", type=int, nargs="+",
+                        default=[10, 100, 1000])
+    parser.add_argument("--solvers", nargs="+", choices=list(SOLVERS),
+                        default=list(SOLVERS))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--list-limit", type=int, default=100,
+                        help="largest size to run the quadratic "
+                             "list-based frontiers on")
+    parser.add_argument("--idastar-limit", type=int, default=50,
+                        help="largest size to run idastar on, which keeps "
+                             "no table of visited cells by default and "
+                             "grows exponentially on large mazes")
+    parser.add_argument("-o", "--output",
+                        help="file to append records to, or stdout")
+    args = parser.parse_args()
+
+    out = sys.stdout if args.output is None else open(args.output, "a")
+    with out:
+        for kind in args.generators:
+            for size in args.sizes:
+                fd, filename = tempfile.mkstemp(suffix=".txt")
+                try:
+                    with os.fdopen(fd, "w") as f:
+                        f.write(generate(kind, size, size, args.seed))
+                    for solver in args.solvers:
+                        if solver.endswith("-list") and size > args.list_limit:
+                            continue
+                        if solver == "idastar" and size > args.idastar_limit:
+                            continue
+                        record = {
+                            "generator": kind,
+                            "size": size,
+                            "seed": args.seed,
+                            "solver": solver
+                        }
+                        record.update(measure(filename, solver))
+                        out.write(json.dumps(record) + "\n")
+                        out.flush()
+                finally:
+                    os.remove(filename)
+
+
+if __name__ == "__main__":
+    main()
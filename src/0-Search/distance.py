@@ -0,0 +1,168 @@
+import argparse
+import struct
+import sys
+
+from array import array
+from collections import deque
+
+from grid import GridMaze, UP, DOWN, LEFT, RIGHT, START, ACTIONS
+
+MAGIC = b"MAZEDIST"
+VERSION = 1
+
+# Magic, version, height, width, goal row and goal column
+HEADER = struct.Struct("<8sIIIII")
+
+UNREACHABLE = 0xFFFFFFFF
+
+
+class DistanceField():
+    """
+    Shortest distances from every cell of a maze to its goal, together
+    with the first move of a shortest path from each cell, so a path from
+    any start is found by following moves in O(path length).
+
+    Cell (row, col) is index row * width + col. moves holds one of the
+    grid module's UP, DOWN, LEFT or RIGHT per reachable cell, START at
+    the goal and 0 elsewhere.
+    """
+
+    def __init__(self, height, width, goal, distances, moves):
+        self.height = height
+        self.width = width
+        self.goal = goal
+        self.distances = distances
+        self.moves = moves
+
+    @classmethod
+    def build(cls, maze):
+        """Runs one breadth-first search outwards from the goal of maze."""
+        width = maze.width
+        last_row = (maze.height - 1) * width
+        walls = maze.walls
+        goal = maze.index(maze.goal)
+
+        distances = array("I", [UNREACHABLE]) * len(walls)
+        moves = bytearray(len(walls))
+        distances[goal] = 0
+        moves[goal] = START
+
+        # A cell reached by stepping up from its neighbor
+        # must step down to get back towards the goal
+        queue = deque([goal])
+        while queue:
+            cell = queue.popleft()
+            distance = distances[cell] + 1
+            col = cell % width
+            candidates = []
+            if cell >= width:
+                candidates.append((cell - width, DOWN))
+            if cell < last_row:
+                candidates.append((cell + width, UP))
+            if col > 0:
+                candidates.append((cell - 1, RIGHT))
+            if col < width - 1:
+                candidates.append((cell + 1, LEFT))
+            for neighbor, move in candidates:
+                if not walls[neighbor] and not moves[neighbor]:
+                    distances[neighbor] = distance
+                    moves[neighbor] = move
+                    queue.append(neighbor)
+
+        return cls(maze.height, maze.width, maze.goal, distances, moves)
+
+    def distance(self, start):
+        """Returns the length of a shortest path from start, or None."""
+        distance = self.distances[start[0] * self.width + start[1]]
+        return None if distance == UNREACHABLE else distance
+
+    def path_from(self, start):
+        """
+        Returns a shortest path from start to the goal as (actions, cells)
+        like Maze.solution, or None if the goal cannot be reached.
+        """
+        row, col = start
+        if not (0 <= row < self.height and 0 <= col < self.width):
+            return None
+        width = self.width
+        step = {UP: -width, DOWN: width, LEFT: -1, RIGHT: 1}
+        cell = row * width + col
+        if not self.moves[cell]:
+            return None
+
+        actions = []
+        cells = []
+        while self.moves[cell] != START:
+            move = self.moves[cell]
+            cell += step[move]
+            actions.append(ACTIONS[move])
+            cells.append(divmod(cell, width))
+        return (actions, cells)
+
+    def save(self, filename):
+        with open(filename, "wb") as f:
+            f.write(HEADER.pack(MAGIC, VERSION, self.height, self.width,
+                                *self.goal))
+            f.write(self.moves)
+            self.distances.tofile(f)
+
+    @classmethod
+    def load(cls, filename):
+        with open(filename, "rb") as f:
+            magic, version, height, width, *goal = HEADER.unpack(
+                f.read(HEADER.size)
+            )
+            if magic != MAGIC or version != VERSION:
+                raise Exception("not a distance field file")
+            moves = bytearray(f.read(height * width))
+            distances = array("I")
+            distances.fromfile(f, height * width)
+        return cls(height, width, tuple(goal), distances, moves)
+
+
+def read_starts(filename):
+    """Reads "row col" start cells, one per line, from a file or stdin."""
+    f = sys.stdin if filename == "-" else open(filename)
+    with f:
+        for line in f:
+            if line.strip():
+                row, col = line.split()
+                yield int(row), int(col)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Answer many start cells against one goal "
+                    "from a precomputed distance field."
+    )
+    parser.add_argument("maze", nargs="?",
+                        help="maze to build the field from")
+    parser.add_argument("--field",
+                        help="load a saved field instead of building one")
+    parser.add_argument("--save", help="write the field to this file")
+    parser.add_argument("--starts",
+                        help='file of "row col" lines, or - for stdin')
+    args = parser.parse_args()
+
+    if args.field is not None:
+        field = DistanceField.load(args.field)
+    elif args.maze is not None:
+        field = DistanceField.build(GridMaze(args.maze))
+    else:
+        parser.error("either a maze or --field is required")
+
+    if args.save is not None:
+        field.save(args.save)
+
+    if args.starts is not None:
+        for start in read_starts(args.starts):
+            path = field.path_from(start)
+            if path is None:
+                print(f"{start[0]} {start[1]} no solution")
+            else:
+                print(" ".join([str(start[0]), str(start[1]),
+                                str(len(path[0])), *path[0]]))
+
+
+if __name__ == "__main__":
+    main()
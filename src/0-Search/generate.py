@@ -0,0 +1,157 @@
+import argparse
+import random
+import sys
+
+WALL = ord("#")
+OPEN = ord(" ")
+
+
+def backtracker(height, width, rng):
+    """
+    Returns a perfect maze carved by a randomized depth-first search,
+    as a list of bytearray rows. Cells sit on odd coordinates, so even
+    dimensions leave an extra wall along the bottom or right edge.
+    """
+    grid = [bytearray([WALL]) * width for _ in range(height)]
+    rows, cols = (height - 1) // 2, (width - 1) // 2
+    if rows < 1 or cols < 1:
+        raise ValueError("maze must be at least 3x3")
+
+    grid[1][1] = OPEN
+    stack = [(0, 0)]
+    while stack:
+        row, col = stack[-1]
+        neighbors = [
+            (row + dr, col + dc)
+            for dr, dc in ((-1, 0), (1, 0), (0, -1), (0, 1))
+            if 0 <= row + dr < rows and 0 <= col + dc < cols
+            and grid[2 * (row + dr) + 1][2 * (col + dc) + 1] == WALL
+        ]
+        if not neighbors:
+            stack.pop()
+            continue
+        next_row, next_col = rng.choice(neighbors)
+        grid[row + next_row + 1][col + next_col + 1] = OPEN
+        grid[2 * next_row + 1][2 * next_col + 1] = OPEN
+        stack.append((next_row, next_col))
+    return grid
+
+
+def prim(height, width, rng):
+    """
+    Returns a perfect maze grown by randomized Prim's algorithm, as a list
+    of bytearray rows, with cells on odd coordinates like backtracker.
+    """
+    grid = [bytearray([WALL]) * width for _ in range(height)]
+    rows, cols = (height - 1) // 2, (width - 1) // 2
+    if rows < 1 or cols < 1:
+        raise ValueError("maze must be at least 3x3")
+
+    def add_walls(row, col):
+        for dr, dc in ((-1, 0), (1, 0), (0, -1), (0, 1)):
+            if 0 <= row + dr < rows and 0 <= col + dc < cols:
+                frontier.append((row, col, row + dr, col + dc))
+
+    frontier = []
+    grid[1][1] = OPEN
+    add_walls(0, 0)
+    while frontier:
+
+        # Remove a random frontier wall in O(1) by swapping it to the end
+        i = rng.randrange(len(frontier))
+        frontier[i], frontier[-1] = frontier[-1], frontier[i]
+        row, col, next_row, next_col = frontier.pop()
+
+        if grid[2 * next_row + 1][2 * next_col + 1] == OPEN:
+            continue
+        grid[row + next_row + 1][col + next_col + 1] = OPEN
+        grid[2 * next_row + 1][2 * next_col + 1] = OPEN
+        add_walls(next_row, next_col)
+    return grid
+
+
+def rooms(height, width, rng, density=0.1, room_size=None):
+    """
+    Returns mostly open space as a list of bytearray rows: a fraction
+    density of cells are single obstacles and, if room_size is given,
+    walls divide the space into rooms joined by one door per wall.
+    """
+    grid = [
+        bytearray(WALL if rng.random() < density else OPEN
+                  for _ in range(width))
+        for _ in range(height)
+    ]
+    if room_size:
+        for row in range(room_size, height, room_size + 1):
+            grid[row][:] = bytes([WALL]) * width
+            for start in range(0, width, room_size + 1):
+                end = min(start + room_size, width)
+                grid[row][rng.randrange(start, end)] = OPEN
+        for col in range(room_size, width, room_size + 1):
+            for start in range(0, height, room_size + 1):
+                end = min(start + room_size, height)
+                door = rng.randrange(start, end)
+                for row in range(start, end):
+                    grid[row][col] = OPEN if row == door else WALL
+    return grid
+
+
+GENERATORS = {
+    "backtracker": backtracker,
+    "prim": prim,
+    "rooms": rooms
+}
+
+
+def place_endpoints(grid):
+    """
+    Marks the first open cell as the start A and the last as the goal B,
+    opening the corners if every cell is a wall.
+    """
+    height, width = len(grid), len(grid[0])
+    cells = range(height * width)
+    start = next((i for i in cells if grid[i // width][i % width] == OPEN), 0)
+    goal = next((i for i in reversed(cells)
+                 if grid[i // width][i % width] == OPEN), height * width - 1)
+    if start == goal:
+        goal = height * width - 1 if start != height * width - 1 else 0
+    grid[start // width][start % width] = ord("A")
+    grid[goal // width][goal % width] = ord("B")
+    return grid
+
+
+def generate(kind, height, width, seed=0, **options):
+    """Returns the text of a generated maze in the maze.txt format."""
+    rng = random.Random(seed)
+    grid = place_endpoints(GENERATORS[kind](height, width, rng, **options))
+    return b"\n".join(grid).decode("ascii") + "\n"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a maze file.")
+    parser.add_argument("kind", choices=sorted(GENERATORS))
+    parser.add_argument("size", type=int, help="height of the maze")
+    parser.add_argument("--width", type=int,
+                        help="width of the maze, if not square")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--density", type=float, default=0.1,
+                        help="obstacle density, for rooms")
+    parser.add_argument("--room-size", type=int,
+                        help="size of each room, for rooms")
+    parser.add_argument("-o", "--output", help="file to write, or stdout")
+    args = parser.parse_args()
+
+    options = {}
+    if args.kind == "rooms":
+        options = {"density": args.density, "room_size": args.room_size}
+    text = generate(args.kind, args.size, args.width or args.size,
+                    args.seed, **options)
+    if args.output is None:
+        sys.stdout.write(text)
+    else:
+        with open(args.output, "w") as f:
+            f.write(text)
+
+
+if __name__ == "__main__":
+    main()
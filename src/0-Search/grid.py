@@ -0,0 +1,200 @@
+import instrument
+
+from collections import deque
+
+# Bytes that are open cells; every other character is a wall
+OPEN = b" AB"
+WALL_TABLE = bytes(0 if bytes([c]) in OPEN else 1 for c in range(256))
+
+# Moves, as stored in the parents array
+UP, DOWN, LEFT, RIGHT, START = 1, 2, 3, 4, 5
+ACTIONS = {UP: "up", DOWN: "down", LEFT: "left", RIGHT: "right"}
+
+
+class NoSolution(Exception):
+    """Raised by solvers when the goal cannot be reached from the start."""
+
+    def __init__(self):
+        super().__init__("no solution")
+
+
+class GridMaze():
+    """
+    Maze stored as flat byte arrays instead of lists of lists and tuples,
+    for mazes too large for Maze.
+
+    Cell (row, col) is index row * width + col. walls holds one byte per
+    cell, and a solve records, for each reached cell, the move that first
+    reached it, which serves as both explored set and parent pointers.
+    """
+
+    def __init__(self, filename):
+
+        # First pass: measure the maze and find the start and goal
+        self.height = 0
+        self.width = 0
+        starts = 0
+        goals = 0
+        with open(filename, "rb") as f:
+            for row, line in enumerate(f):
+                line = line.rstrip(b"\r\n")
+                self.height += 1
+                self.width = max(self.width, len(line))
+                if b"A" in line:
+                    starts += line.count(b"A")
+                    self.start = (row, line.index(b"A"))
+                if b"B" in line:
+                    goals += line.count(b"B")
+                    self.goal = (row, line.index(b"B"))
+
+        # Validate start and goal
+        if starts != 1:
+            raise Exception("maze must have exactly one start point")
+        if goals != 1:
+            raise Exception("maze must have exactly one goal")
+
+        # Second pass: fill in the walls; short lines are open past their end
+        self.walls = bytearray(self.height * self.width)
+        with open(filename, "rb") as f:
+            for row, line in enumerate(f):
+                line = line.rstrip(b"\r\n").translate(WALL_TABLE)
+                offset = row * self.width
+                self.walls[offset:offset + len(line)] = line
+
+        self.solution = None
+        self.parents = None
+
+    def index(self, cell):
+        row, col = cell
+        return row * self.width + col
+
+    def cell(self, index):
+        return divmod(index, self.width)
+
+    def print(self):
+        solution = set()
+        if self.solution is not None:
+            solution = set(self.solution[1])
+        print()
+        for i in range(self.height):
+            row = self.walls[i * self.width:(i + 1) * self.width]
+            for j, wall in enumerate(row):
+                if wall:
+                    print("█", end="")
+                elif (i, j) == self.start:
+                    print("A", end="")
+                elif (i, j) == self.goal:
+                    print("B", end="")
+                elif (i, j) in solution:
+                    print("*", end="")
+                else:
+                    print(" ", end="")
+            print()
+        print()
+
+    def solve(self):
+        """Finds a shortest solution to maze with BFS, if one exists."""
+        width = self.width
+        last_row = (self.height - 1) * width
+        walls = self.walls
+        start = self.index(self.start)
+        goal = self.index(self.goal)
+        stats = instrument.start("grid", start=self.start, goal=self.goal)
+
+        # Keep track of number of states explored
+        self.num_explored = 0
+
+        parents = bytearray(len(walls))
+        parents[start] = START
+        queue = deque([start])
+        if stats is not None:
+            stats.lap("setup")
+        while queue:
+            cell = queue.popleft()
+            self.num_explored += 1
+            if cell == goal:
+                break
+
+            col = cell % width
+            if cell >= width:
+                neighbor = cell - width
+                if not walls[neighbor] and not parents[neighbor]:
+                    parents[neighbor] = UP
+                    queue.append(neighbor)
+            if cell < last_row:
+                neighbor = cell + width
+                if not walls[neighbor] and not parents[neighbor]:
+                    parents[neighbor] = DOWN
+                    queue.append(neighbor)
+            if col > 0:
+                neighbor = cell - 1
+                if not walls[neighbor] and not parents[neighbor]:
+                    parents[neighbor] = LEFT
+                    queue.append(neighbor)
+            if col < width - 1:
+                neighbor = cell + 1
+                if not walls[neighbor] and not parents[neighbor]:
+                    parents[neighbor] = RIGHT
+                    queue.append(neighbor)
+        else:
+            if stats is not None:
+                stats.lap("search")
+                self.report(stats, False, parents)
+            raise NoSolution()
+
+        if stats is not None:
+            stats.lap("search")
+        self.parents = parents
+        self.solution = self.trace(goal)
+        if stats is not None:
+            stats.lap("reconstruct")
+            self.report(stats, True, parents)
+
+    def report(self, stats, found, parents):
+        """
+        Finishes stats for a search. To keep the inner loop as it is,
+        generated is recovered from parents, where every cell added to
+        the queue was marked once, and the peak frontier and duplicates
+        are not tracked, so they are reported as None.
+        """
+        stats.finish(found, expanded=self.num_explored,
+                     generated=len(parents) - parents.count(0),
+                     peak_frontier=None, duplicates=None)
+
+    def trace(self, cell):
+        """Follows the parents array back from cell to the start."""
+        width = self.width
+        back = {UP: width, DOWN: -width, LEFT: 1, RIGHT: -1}
+        actions = []
+        cells = []
+        while self.parents[cell] != START:
+            move = self.parents[cell]
+            actions.append(ACTIONS[move])
+            cells.append(self.cell(cell))
+            cell += back[move]
+        actions.reverse()
+        cells.reverse()
+        return (actions, cells)
+
+    @property
+    def explored(self):
+        """Returns the set of cells reached by the last solve."""
+        return {self.cell(i) for i, move in enumerate(self.parents) if move}
+
+    def output_image(self, filename, show_solution=True, show_explored=False,
+                     cell_size=1, cell_border=0):
+        import numpy as np
+        from render import render
+
+        shape = (self.height, self.width)
+        walls = np.frombuffer(self.walls, dtype=np.uint8).reshape(shape)
+        solution = self.solution[1] if self.solution is not None else None
+        explored = None
+        if solution is not None and show_explored:
+            explored = np.frombuffer(self.parents, dtype=np.uint8) != 0
+        if not show_solution:
+            solution = None
+
+        img = render(walls != 0, self.start, self.goal, solution, explored,
+                     cell_size, cell_border)
+        img.save(filename)
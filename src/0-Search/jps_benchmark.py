@@ -0,0 +1,57 @@
+import argparse
+import os
+import tempfile
+import time
+
+from generate import generate
+from grid import NoSolution
+from maze import Maze
+
+
+def run(filename, algorithm):
+    """Solves filename with algorithm, returning (explored, length, time)."""
+    maze = Maze(filename)
+    start = time.perf_counter()
+    try:
+        maze.solve(algorithm)
+    except NoSolution:
+        return None
+    elapsed = time.perf_counter() - start
+    return maze.num_explored, len(maze.solution[0]), elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare jump point search with BFS and A* "
+                    "on generated open mazes."
+    )
+    parser.add_argument("--sizes", type=int, nargs="+",
+                        default=[50, 100, 200])
+    parser.add_argument("--density", type=float, default=0.1,
+                        help="fraction of cells that are obstacles")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    algorithms = ("bfs", "astar", "jps")
+    print(f"{'size':>6} {'algorithm':>9} {'explored':>9} "
+          f"{'length':>7} {'seconds':>8}")
+    for size in args.sizes:
+        fd, filename = tempfile.mkstemp(suffix=".txt")
+        try:
+            with os.fdopen(fd, "w") as f:
+                f.write(generate("rooms", size, size, args.seed,
+                                 density=args.density))
+            for algorithm in algorithms:
+                result = run(filename, algorithm)
+                if result is None:
+                    print(f"{size:>6} {algorithm:>9} {'no solution':>9}")
+                    continue
+                explored, length, elapsed = result
+                print(f"{size:>6} {algorithm:>9} {explored:>9} "
+                      f"{length:>7} {elapsed:>8.4f}")
+        finally:
+            os.remove(filename)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,31 +1,56 @@
-import sys
+import argparse
+import math
+
+from collections import deque
+from heapq import heappush, heappop
+
+import instrument
+
+from grid import GridMaze, NoSolution
+
 
 class Node():
-    def __init__(self, state, parent, action):
+    def __init__(self, state, parent, action, cost=0):
         self.state = state
         self.parent = parent
         self.action = action
+        # Number of steps from the start
+        self.cost = cost
 
 
 class StackFrontier():
     def __init__(self):
-        self.frontier = []
+        self.frontier = deque()
+        # Number of nodes in the frontier for each state
+        self.states = {}
+
+    def __len__(self):
+        return len(self.frontier)
 
     def add(self, node):
         self.frontier.append(node)
+        self.states[node.state] = self.states.get(node.state, 0) + 1
 
     def contains_state(self, state):
-        return any(node.state == state for node in self.frontier)
+        return state in self.states
 
     def empty(self):
         return len(self.frontier) == 0
 
+    def discard_state(self, state):
+        """Forgets one occurrence of state once its node leaves the frontier."""
+        count = self.states[state]
+        if count == 1:
+            del self.states[state]
+        else:
+            self.states[state] = count - 1
+
     def remove(self):
         if self.empty():
             raise Exception("empty frontier")
         else:
-            node = self.frontier[-1]
-            self.frontier = self.frontier[:-1]
+            node = self.frontier.pop()
+            self.discard_state(node.state)
             return node
 
 
@@ -35,10 +60,82 @@ class QueueFrontier(StackFrontier):
         if self.empty():
             raise Exception("empty frontier")
         else:
-            node = self.frontier[0]
-            self.frontier = self.frontier[1:]
+            node = self.frontier.popleft()
+            self.discard_state(node.state)
             return node
 
+
+class PriorityFrontier():
+    """
+    Frontier that removes the node with the lowest priority first.
+    Adding a state that is already in the frontier only replaces it if the
+    new node reached it at a lower cost; replaced entries stay in the heap
+    and are skipped when they surface.
+    Ties between equal priorities go to the most recently added node.
+    """
+
+    def __init__(self, priority):
+        self.priority = priority
+        self.heap = []
+        # Lowest cost in the frontier for each state
+        self.costs = {}
+        self.count = 0
+
+    def __len__(self):
+        return len(self.costs)
+
+    def add(self, node):
+        """
+        Adds node unless its state is already in the frontier at no
+        higher cost, returning whether it was added.
+        """
+        best = self.costs.get(node.state)
+        if best is not None and best <= node.cost:
+            return False
+        self.costs[node.state] = node.cost
+        self.count += 1
+        heappush(self.heap, (self.priority(node), -self.count, node))
+        return True
+
+    def contains_state(self, state):
+        return state in self.costs
+
+    def empty(self):
+        return len(self.costs) == 0
+
+    def remove(self):
+        if self.empty():
+            raise Exception("empty frontier")
+        while True:
+            node = heappop(self.heap)[2]
+            if self.costs.get(node.state) == node.cost:
+                del self.costs[node.state]
+                return node
+
+
+def manhattan(a, b):
+    return abs(a[0] - b[0]) + abs(a[1] - b[1])
+
+
+def euclidean(a, b):
+    return math.hypot(a[0] - b[0], a[1] - b[1])
+
+
+HEURISTICS = {
+    "manhattan": manhattan,
+    "euclidean": euclidean
+}
+
+ALGORITHMS = ("dfs", "bfs", "greedy", "astar", "jps", "idastar")
+
+DIRECTIONS = {
+    (-1, 0): "up",
+    (1, 0): "down",
+    (0, -1): "left",
+    (0, 1): "right"
+}
+
+
 class Maze():
 
     def __init__(self, filename):
@@ -116,26 +213,46 @@ class Maze():
         return result
 
 
-    def solve(self):
-        """Finds a solution to maze, if one exists."""
+    def solve(self, algorithm="dfs", heuristic="manhattan", table_size=0):
+        """
+        Finds a solution to maze, if one exists, using one of ALGORITHMS:
+        depth-first, breadth-first, greedy best-first, A*, jump point or
+        iterative deepening A* search. The informed searches estimate the
+        distance to the goal with one of HEURISTICS.
+        """
+        stats = instrument.start("maze", algorithm=algorithm,
+                                 start=self.start, goal=self.goal)
+        if algorithm == "jps":
+            return self.solve_jps(heuristic, stats)
+        if algorithm == "idastar":
+            return self.solve_idastar(heuristic, table_size, stats)
 
         # Keep track of number of states explored
         self.num_explored = 0
+        generated = 1
+        duplicates = 0
 
         # Initialize frontier to just the starting position
         start = Node(state=self.start, parent=None, action=None)
-        frontier = StackFrontier()
+        frontier = self.frontier(algorithm, heuristic)
         frontier.add(start)
+        informed = isinstance(frontier, PriorityFrontier)
 
         # Initialize an empty explored set
         self.explored = set()
+        if stats is not None:
+            stats.lap("setup")
 
         # Keep looping until solution found
         while True:
 
             # If nothing left in frontier, then no path
             if frontier.empty():
-                raise Exception("no solution")
+                if stats is not None:
+                    stats.lap("search")
+                    stats.finish(False, expanded=self.num_explored,
+                                 generated=generated, duplicates=duplicates)
+                raise NoSolution()
 
             # Choose a node from the frontier
             node = frontier.remove()
@@ -143,6 +260,8 @@ class Maze():
 
             # If node is the goal, then we have a solution
             if node.state == self.goal:
+                if stats is not None:
+                    stats.lap("search")
                 actions = []
                 cells = []
                 while node.parent is not None:
@@ -152,78 +271,362 @@ class Maze():
                 actions.reverse()
                 cells.reverse()
                 self.solution = (actions, cells)
+                if stats is not None:
+                    stats.lap("reconstruct")
+                    stats.finish(True, expanded=self.num_explored,
+                                 generated=generated, duplicates=duplicates)
                 return
 
             # Mark node as explored
             self.explored.add(node.state)
 
-            # Add neighbors to frontier
+            # Add neighbors to frontier; a priority frontier also takes
+            # states it already holds, keeping whichever is cheaper, and
+            # returns False when it drops the new node
             for action, state in self.neighbors(node.state):
-                if not frontier.contains_state(state) and state not in self.explored:
-                    child = Node(state=state, parent=node, action=action)
-                    frontier.add(child)
+                if state in self.explored:
+                    duplicates += 1
+                    continue
+                if not informed and frontier.contains_state(state):
+                    duplicates += 1
+                    continue
+                child = Node(state=state, parent=node, action=action,
+                             cost=node.cost + 1)
+                if frontier.add(child) is False:
+                    duplicates += 1
+                else:
+                    generated += 1
 
+            if stats is not None and len(frontier) > stats.peak_frontier:
+                stats.peak_frontier = len(frontier)
 
-    def output_image(self, filename, show_solution=True, show_explored=False):
-        from PIL import Image, ImageDraw
-        cell_size = 50
-        cell_border = 2
 
-        # Create a blank canvas
-        img = Image.new(
-            "RGBA",
-            (self.width * cell_size, self.height * cell_size),
-            "black"
-        )
-        draw = ImageDraw.Draw(img)
+    def solve_jps(self, heuristic="manhattan", stats=None):
+        """
+        Finds a shortest solution to maze with jump point search: A* over
+        only the cells where an optimal path may need to turn.
 
-        solution = self.solution[1] if self.solution is not None else None
-        for i, row in enumerate(self.walls):
-            for j, col in enumerate(row):
+        Paths are made canonical by preferring to move horizontally first.
+        Moving horizontally, a cell becomes a jump point when a vertical
+        scan from it finds one. Moving vertically, a cell becomes a jump
+        point when a horizontal neighbor is open but the cell behind that
+        neighbor is a wall, so turning there cannot be done earlier.
+        States are (cell, direction), since the same cell offers different
+        successors depending on how it was entered.
+        """
+        h = HEURISTICS[heuristic]
+        goal = self.goal
 
-                # Walls
-                if col:
-                    fill = (40, 40, 40)
+        def priority(node):
+            estimate = h(node.state[0], goal)
+            return (node.cost + estimate, estimate)
 
-                # Start
-                elif (i, j) == self.start:
-                    fill = (255, 0, 0)
+        # Keep track of number of jump points explored
+        self.num_explored = 0
+        self.explored = set()
 
-                # Goal
-                elif (i, j) == self.goal:
-                    fill = (0, 171, 28)
+        frontier = PriorityFrontier(priority)
+        frontier.add(Node(state=(self.start, None), parent=None, action=None))
+        closed = set()
+        generated = 1
+        duplicates = 0
+        if stats is not None:
+            stats.lap("setup")
 
-                # Solution
-                elif solution is not None and show_solution and (i, j) in solution:
-                    fill = (220, 235, 113)
+        while True:
+            if frontier.empty():
+                if stats is not None:
+                    stats.lap("search")
+                    stats.finish(False, expanded=self.num_explored,
+                                 generated=generated, duplicates=duplicates)
+                raise NoSolution()
 
-                # Explored
-                elif solution is not None and show_explored and (i, j) in self.explored:
-                    fill = (212, 97, 85)
+            node = frontier.remove()
+            self.num_explored += 1
+            cell, direction = node.state
+
+            if cell == goal:
+                if stats is not None:
+                    stats.lap("search")
+                points = []
+                while node is not None:
+                    points.append(node.state[0])
+                    node = node.parent
+                points.reverse()
+                self.solution = self.interpolate(points)
+                if stats is not None:
+                    stats.lap("reconstruct")
+                    stats.finish(True, expanded=self.num_explored,
+                                 generated=generated, duplicates=duplicates)
+                return
 
-                # Empty cell
+            closed.add(node.state)
+            self.explored.add(cell)
+
+            for direction in self.jump_directions(cell, direction):
+                point = self.jump(cell, direction)
+                if point is None:
+                    continue
+                if (point, direction) in closed:
+                    duplicates += 1
+                    continue
+                cost = node.cost + manhattan(cell, point)
+                if frontier.add(Node(state=(point, direction), parent=node,
+                                     action=DIRECTIONS[direction],
+                                     cost=cost)):
+                    generated += 1
                 else:
-                    fill = (237, 240, 252)
+                    duplicates += 1
+
+            if stats is not None and len(frontier) > stats.peak_frontier:
+                stats.peak_frontier = len(frontier)
 
-                # Draw cell
-                draw.rectangle(
-                    ([(j * cell_size + cell_border, i * cell_size + cell_border),
-                      ((j + 1) * cell_size - cell_border, (i + 1) * cell_size - cell_border)]),
-                    fill=fill
+
+    def solve_idastar(self, heuristic="manhattan", table_size=0,
+                      stats=None):
+        """
+        Finds a shortest solution to maze with iterative deepening A*:
+        repeated depth-first searches that cut off paths whose estimated
+        length exceeds a bound, raising the bound each time.
+
+        Memory is linear in the path length. Cells already on the current
+        path are skipped, and up to table_size cells remember the lowest
+        cost they were reached at in this iteration, to prune revisits.
+        No explored set is kept, so explored is left empty.
+        """
+        h = HEURISTICS[heuristic]
+
+        # Keep track of number of states explored, over all iterations
+        self.num_explored = 0
+        self.explored = set()
+
+        bound = h(self.start, self.goal)
+        if stats is not None:
+            stats.lap("setup")
+        while True:
+            path, bound = self.bounded_search(bound, h, table_size, stats)
+            if path is not None:
+                if stats is not None:
+                    stats.lap("search")
+                self.solution = (
+                    [action for action, cell in path[1:]],
+                    [cell for action, cell in path[1:]]
                 )
+                if stats is not None:
+                    stats.lap("reconstruct")
+                    stats.finish(True, expanded=self.num_explored)
+                return
+            if bound == math.inf:
+                if stats is not None:
+                    stats.lap("search")
+                    stats.finish(False, expanded=self.num_explored)
+                raise NoSolution()
+
+
+    def bounded_search(self, bound, h, table_size, stats=None):
+        """
+        Runs one depth-first iteration of IDA* up to bound.
+        Returns (path, bound) with a path of (action, cell) pairs if the
+        goal was found, or (None, next bound) otherwise.
+        The path is the frontier here, so stats record its longest length.
+        """
+        goal = self.goal
+
+        def successors(cell):
+            """Neighbors of cell, most promising first."""
+            return iter(sorted(self.neighbors(cell),
+                               key=lambda neighbor: h(neighbor[1], goal)))
+
+        path = [(None, self.start)]
+        on_path = {self.start}
+        table = {}
+        frames = [successors(self.start)]
+        self.num_explored += 1
+        if self.start == goal:
+            return path, bound
+
+        next_bound = math.inf
+        while frames:
+            child = next(frames[-1], None)
+            if child is None:
+                frames.pop()
+                on_path.discard(path.pop()[1])
+                continue
+
+            action, cell = child
+            cost = len(path)
+            estimate = cost + h(cell, goal)
+            if estimate > bound:
+                next_bound = min(next_bound, estimate)
+                continue
+            if cell in on_path:
+                if stats is not None:
+                    stats.duplicates += 1
+                continue
+            if table_size:
+                best = table.get(cell)
+                if best is not None and best <= cost:
+                    if stats is not None:
+                        stats.duplicates += 1
+                    continue
+                if best is not None or len(table) < table_size:
+                    table[cell] = cost
+
+            path.append(child)
+            on_path.add(cell)
+            self.num_explored += 1
+            if stats is not None:
+                stats.generated += 1
+                stats.peak_frontier = max(stats.peak_frontier, len(path))
+            if cell == goal:
+                return path, bound
+            frames.append(successors(cell))
+
+        return None, next_bound
+
+
+    def is_open(self, row, col):
+        return (0 <= row < self.height and 0 <= col < self.width
+                and not self.walls[row][col])
+
+
+    def jump_directions(self, cell, direction):
+        """
+        Returns the directions worth scanning from a jump point entered
+        moving in direction, or every direction from the start.
+        """
+        if direction is None:
+            return list(DIRECTIONS)
+        dr, dc = direction
+        if dr == 0:
+            return [direction, (-1, 0), (1, 0)]
+        row, col = cell
+        result = [direction]
+        for side in (-1, 1):
+            if (self.is_open(row, col + side)
+                    and not self.is_open(row - dr, col + side)):
+                result.append((0, side))
+        return result
 
-        img.save(filename)
 
+    def jump(self, cell, direction):
+        """
+        Scans from cell in direction and returns the next jump point,
+        or None if the scan runs into a wall first.
+        """
+        row, col = cell
+        dr, dc = direction
+        while True:
+            row += dr
+            col += dc
+            if not self.is_open(row, col):
+                return None
+            if (row, col) == self.goal:
+                return (row, col)
+            if dr == 0:
+                if (self.jump((row, col), (-1, 0)) is not None
+                        or self.jump((row, col), (1, 0)) is not None):
+                    return (row, col)
+            else:
+                for side in (-1, 1):
+                    if (self.is_open(row, col + side)
+                            and not self.is_open(row - dr, col + side)):
+                        return (row, col)
+
+
+    def interpolate(self, points):
+        """
+        Expands a list of jump points joined by straight segments into
+        the (actions, cells) form of a solution, excluding the start.
+        """
+        actions = []
+        cells = []
+        for (row, col), (end_row, end_col) in zip(points, points[1:]):
+            dr = (end_row > row) - (end_row < row)
+            dc = (end_col > col) - (end_col < col)
+            while (row, col) != (end_row, end_col):
+                row += dr
+                col += dc
+                actions.append(DIRECTIONS[(dr, dc)])
+                cells.append((row, col))
+        return (actions, cells)
+
+
+    def frontier(self, algorithm, heuristic):
+        """Returns an empty frontier for the given search algorithm."""
+        if algorithm == "dfs":
+            return StackFrontier()
+        if algorithm == "bfs":
+            return QueueFrontier()
+        if heuristic not in HEURISTICS:
+            raise ValueError(f"unknown heuristic {heuristic}")
+        h = HEURISTICS[heuristic]
+        goal = self.goal
+
+        # Break ties towards nodes closer to the goal, which are deeper
+        # along equally good paths and so reach the goal sooner
+        if algorithm == "greedy":
+            return PriorityFrontier(lambda node: h(node.state, goal))
+        if algorithm == "astar":
+            def priority(node):
+                estimate = h(node.state, goal)
+                return (node.cost + estimate, estimate)
+            return PriorityFrontier(priority)
+        raise ValueError(f"unknown algorithm {algorithm}")
+
+
+    def output_image(self, filename, show_solution=True, show_explored=False,
+                     cell_size=50, cell_border=2):
+        from render import render
+
+        solution = self.solution[1] if self.solution is not None else None
+        explored = None
+        if solution is not None and show_explored:
+            explored = self.explored
+        if not show_solution:
+            solution = None
+
+        img = render(self.walls, self.start, self.goal, solution, explored,
+                     cell_size, cell_border)
+        img.save(filename)
 
-if len(sys.argv) != 2:
-    sys.exit("Usage: python maze.py maze.txt")
 
-m = Maze(sys.argv[1])
-print("Maze:")
-m.print()
-print("Solving...")
-m.solve()
-print("States Explored:", m.num_explored)
-print("Solution:")
-m.print()
-m.output_image("maze.png", show_explored=True)
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("maze")
+    parser.add_argument("--algorithm", choices=ALGORITHMS, default="dfs")
+    parser.add_argument("--heuristic", choices=sorted(HEURISTICS),
+                        default="manhattan")
+    parser.add_argument("--table-size", type=int, default=0,
+                        help="cells idastar may remember, to prune revisits")
+    parser.add_argument("--compact", action="store_true",
+                        help="solve a very large maze with BFS over flat "
+                             "arrays, drawing one pixel per cell")
+    parser.add_argument("--stats", action="store_true",
+                        help="write search statistics to stderr as JSON")
+    args = parser.parse_args()
+    if args.stats:
+        instrument.enable()
+
+    if args.compact:
+        m = GridMaze(args.maze)
+        print("Solving...")
+        m.solve()
+        print("States Explored:", m.num_explored)
+        print("Solution Length:", len(m.solution[0]))
+        m.output_image("maze.png", show_explored=True)
+        return
+
+    m = Maze(args.maze)
+    print("Maze:")
+    m.print()
+    print("Solving...")
+    m.solve(args.algorithm, args.heuristic, args.table_size)
+    print("States Explored:", m.num_explored)
+    print("Solution:")
+    m.print()
+    m.output_image("maze.png", show_explored=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+import numpy as np
+
+from PIL import Image
+
+# Colors, indexed by the kind of cell
+EMPTY, WALL, START, GOAL, SOLUTION, EXPLORED = range(6)
+PALETTE = np.array([
+    (237, 240, 252),
+    (40, 40, 40),
+    (255, 0, 0),
+    (0, 171, 28),
+    (220, 235, 113),
+    (212, 97, 85)
+], dtype=np.uint8)
+
+
+def render(walls, start, goal, solution=None, explored=None,
+           cell_size=50, cell_border=2):
+    """
+    Draws a maze as an image in one pass over whole arrays.
+
+    walls is a height x width boolean array, solution a sequence of
+    (row, col) cells and explored a boolean array or a collection of
+    (row, col) cells. Each cell becomes a cell_size square whose outer
+    cell_border pixels are left black; with cell_size 1 every cell is a
+    single pixel, for mazes too large to draw at full size.
+    """
+    walls = np.asarray(walls, dtype=bool)
+    height, width = walls.shape
+
+    # Later assignments take precedence over earlier ones
+    kinds = np.full((height, width), EMPTY, dtype=np.uint8)
+    if explored is not None:
+        kinds[cell_mask(explored, walls.shape)] = EXPLORED
+    if solution:
+        kinds[cell_mask(solution, walls.shape)] = SOLUTION
+    kinds[walls] = WALL
+    kinds[start] = START
+    kinds[goal] = GOAL
+
+    pixels = PALETTE[kinds]
+    if cell_size > 1:
+        pixels = pixels.repeat(cell_size, axis=0).repeat(cell_size, axis=1)
+
+        # Black out the border pixels around every cell
+        interior = np.zeros(cell_size, dtype=bool)
+        interior[cell_border:cell_size - cell_border + 1] = True
+        pixels[~np.tile(interior, height), :, :] = 0
+        pixels[:, ~np.tile(interior, width), :] = 0
+
+    return Image.fromarray(pixels, "RGB")
+
+
+def cell_mask(cells, shape):
+    """Returns a boolean array marking cells, given as a mask or cells."""
+    if isinstance(cells, np.ndarray):
+        return cells.astype(bool, copy=False).reshape(shape)
+    mask = np.zeros(shape, dtype=bool)
+    if cells:
+        rows, cols = zip(*cells)
+        mask[list(rows), list(cols)] = True
+    return mask
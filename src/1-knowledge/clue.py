@@ -21,10 +21,11 @@ symbols = characters + rooms + weapons
 
 
 def check_knowledge(knowledge):
+    answers = classify_symbols(knowledge, symbols)
     for symbol in symbols:
-        if model_check(knowledge, symbol):
+        if answers[symbol] == YES:
             termcolor.cprint(f"{symbol}: YES", "green")
-        elif not model_check(knowledge, Not(symbol)):
+        elif answers[symbol] == MAYBE:
             print(f"{symbol}: MAYBE")
 
 
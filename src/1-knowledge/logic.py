@@ -1,19 +1,138 @@
+import functools
+import heapq
 import itertools
+import weakref
+
+# Most symbols for which model_check enumerates every model
+ENUMERATION_LIMIT = 12
+
+# Answers of classify_symbols
+YES = "YES"
+NO = "NO"
+MAYBE = "MAYBE"
+
+# Most recent models a KnowledgeBase keeps to answer queries without
+# solving
+KEPT_MODELS = 16
+
+# Fewest truth table chunks for which numpy_check uses processes
+PARALLEL_CHUNKS = 16
+
+# Code generated by compile_sentence for each part of a sentence,
+# for single models and for NumPy arrays of models
+SCALAR_CODE = {
+    "symbol": "not not values[{}]",
+    "not": "not {}",
+    "and": " and ",
+    "true": "True",
+    "or": " or ",
+    "false": "False",
+    "implies": "not {} or {}",
+    "biconditional": "{} == {}"
+}
+VECTOR_CODE = {
+    "symbol": "values[{}]",
+    "not": "~{}",
+    "and": " & ",
+    "true": "TRUE",
+    "or": " | ",
+    "false": "FALSE",
+    "implies": "~{} | {}",
+    "biconditional": "{} == {}"
+}
+
+
+def cached(slot):
+    """
+    Decorates a method of no arguments so that its result is kept in
+    slot, for sentences that are cacheable.
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self):
+            value = getattr(self, slot)
+            if value is None:
+                value = method(self)
+                if self.cacheable:
+                    setattr(self, slot, value)
+            return value
+        return wrapper
+    return decorator
+
+
+def release(reference):
+    """Forgets an interned sentence once it has been freed."""
+    if Sentence.interned.get(reference.key) is reference:
+        del Sentence.interned[reference.key]
 
 
 class Sentence():
+    """
+    Every sentence but And is immutable. Those without an And anywhere
+    inside them are frozen: they are interned, so that building one equal
+    to a live sentence returns that sentence instead of a copy, and they
+    cache their hash, symbols and formula. And can grow with add, so it
+    is never interned, and only caches while all its conjuncts are
+    frozen, forgetting the cache on each add.
+    """
+
+    __slots__ = ("frozen", "cacheable", "hash_value", "symbol_set",
+                 "formula_text", "__weakref__")
+
+    # Weak references to live frozen sentences, by class and operands
+    interned = {}
 
     def evaluate(self, model):
         """Evaluates the logical sentence."""
         raise Exception("nothing to evaluate")
 
+    def evaluate_partial(self, model):
+        """
+        Evaluates the logical sentence in a model that may leave symbols
+        unassigned, returning None if the sentence could still be either.
+        """
+        raise Exception("nothing to evaluate")
+
     def formula(self):
         """Returns string formula representing logical sentence."""
         return ""
 
     def symbols(self):
         """Returns a set of all symbols in the logical sentence."""
-        return set()
+        return set(self.names())
+
+    def names(self):
+        """Returns a frozenset of all symbols, which may be shared."""
+        return frozenset()
+
+    def forget(self):
+        """Clears the cached hash, symbols and formula."""
+        self.hash_value = None
+        self.symbol_set = None
+        self.formula_text = None
+
+    @classmethod
+    def create(cls, operands, frozen, **fields):
+        """
+        Returns a sentence of this class with fields, built from operands.
+        If frozen, returns the live sentence built from the same operands
+        if there is one, and otherwise interns the new sentence.
+        """
+        if frozen:
+            key = (cls, *operands)
+            reference = Sentence.interned.get(key)
+            if reference is not None:
+                sentence = reference()
+                if sentence is not None:
+                    return sentence
+        sentence = object.__new__(cls)
+        for name, value in fields.items():
+            setattr(sentence, name, value)
+        sentence.frozen = sentence.cacheable = frozen
+        sentence.forget()
+        if frozen:
+            Sentence.interned[key] = weakref.KeyedRef(sentence, release, key)
+        return sentence
 
     @classmethod
     def validate(cls, sentence):
@@ -44,12 +163,18 @@ class Sentence():
 
 class Symbol(Sentence):
 
-    def __init__(self, name):
-        self.name = name
+    __slots__ = ("name",)
+
+    def __new__(cls, name):
+        return cls.create((name,), True, name=name)
+
+    def __reduce__(self):
+        return (Symbol, (self.name,))
 
     def __eq__(self, other):
         return isinstance(other, Symbol) and self.name == other.name
 
+    @cached("hash_value")
     def __hash__(self):
         return hash(("symbol", self.name))
 
@@ -62,21 +187,33 @@ class Symbol(Sentence):
         except KeyError:
             raise EvaluationException(f"variable {self.name} not in model")
 
+    def evaluate_partial(self, model):
+        value = model.get(self.name)
+        return None if value is None else bool(value)
+
     def formula(self):
         return self.name
 
-    def symbols(self):
-        return {self.name}
+    @cached("symbol_set")
+    def names(self):
+        return frozenset((self.name,))
 
 
 class Not(Sentence):
-    def __init__(self, operand):
+
+    __slots__ = ("operand",)
+
+    def __new__(cls, operand):
         Sentence.validate(operand)
-        self.operand = operand
+        return cls.create((operand,), operand.frozen, operand=operand)
+
+    def __reduce__(self):
+        return (Not, (self.operand,))
 
     def __eq__(self, other):
         return isinstance(other, Not) and self.operand == other.operand
 
+    @cached("hash_value")
     def __hash__(self):
         return hash(("not", hash(self.operand)))
 
@@ -86,22 +223,34 @@ class Not(Sentence):
     def evaluate(self, model):
         return not self.operand.evaluate(model)
 
+    def evaluate_partial(self, model):
+        value = self.operand.evaluate_partial(model)
+        return None if value is None else not value
+
+    @cached("formula_text")
     def formula(self):
         return "¬" + Sentence.parenthesize(self.operand.formula())
 
-    def symbols(self):
-        return self.operand.symbols()
+    def names(self):
+        return self.operand.names()
 
 
 class And(Sentence):
+
+    __slots__ = ("conjuncts",)
+
     def __init__(self, *conjuncts):
         for conjunct in conjuncts:
             Sentence.validate(conjunct)
         self.conjuncts = list(conjuncts)
+        self.frozen = False
+        self.cacheable = all(conjunct.frozen for conjunct in conjuncts)
+        self.forget()
 
     def __eq__(self, other):
         return isinstance(other, And) and self.conjuncts == other.conjuncts
 
+    @cached("hash_value")
     def __hash__(self):
         return hash(
             ("and", tuple(hash(conjunct) for conjunct in self.conjuncts))
@@ -116,29 +265,53 @@ class And(Sentence):
     def add(self, conjunct):
         Sentence.validate(conjunct)
         self.conjuncts.append(conjunct)
+        self.cacheable = self.cacheable and conjunct.frozen
+        self.forget()
 
     def evaluate(self, model):
         return all(conjunct.evaluate(model) for conjunct in self.conjuncts)
 
+    def evaluate_partial(self, model):
+        result = True
+        for conjunct in self.conjuncts:
+            value = conjunct.evaluate_partial(model)
+            if value is False:
+                return False
+            if value is None:
+                result = None
+        return result
+
+    @cached("formula_text")
     def formula(self):
         if len(self.conjuncts) == 1:
             return self.conjuncts[0].formula()
         return " ∧ ".join([Sentence.parenthesize(conjunct.formula())
                            for conjunct in self.conjuncts])
 
-    def symbols(self):
-        return set.union(*[conjunct.symbols() for conjunct in self.conjuncts])
+    @cached("symbol_set")
+    def names(self):
+        return frozenset.union(
+            *[conjunct.names() for conjunct in self.conjuncts]
+        )
 
 
 class Or(Sentence):
-    def __init__(self, *disjuncts):
+
+    __slots__ = ("disjuncts",)
+
+    def __new__(cls, *disjuncts):
         for disjunct in disjuncts:
             Sentence.validate(disjunct)
-        self.disjuncts = list(disjuncts)
+        frozen = all(disjunct.frozen for disjunct in disjuncts)
+        return cls.create(disjuncts, frozen, disjuncts=disjuncts)
+
+    def __reduce__(self):
+        return (Or, self.disjuncts)
 
     def __eq__(self, other):
         return isinstance(other, Or) and self.disjuncts == other.disjuncts
 
+    @cached("hash_value")
     def __hash__(self):
         return hash(
             ("or", tuple(hash(disjunct) for disjunct in self.disjuncts))
@@ -151,28 +324,50 @@ class Or(Sentence):
     def evaluate(self, model):
         return any(disjunct.evaluate(model) for disjunct in self.disjuncts)
 
+    def evaluate_partial(self, model):
+        result = False
+        for disjunct in self.disjuncts:
+            value = disjunct.evaluate_partial(model)
+            if value is True:
+                return True
+            if value is None:
+                result = None
+        return result
+
+    @cached("formula_text")
     def formula(self):
         if len(self.disjuncts) == 1:
             return self.disjuncts[0].formula()
         return " ∨  ".join([Sentence.parenthesize(disjunct.formula())
                             for disjunct in self.disjuncts])
 
-    def symbols(self):
-        return set.union(*[disjunct.symbols() for disjunct in self.disjuncts])
+    @cached("symbol_set")
+    def names(self):
+        return frozenset.union(
+            *[disjunct.names() for disjunct in self.disjuncts]
+        )
 
 
 class Implication(Sentence):
-    def __init__(self, antecedent, consequent):
+
+    __slots__ = ("antecedent", "consequent")
+
+    def __new__(cls, antecedent, consequent):
         Sentence.validate(antecedent)
         Sentence.validate(consequent)
-        self.antecedent = antecedent
-        self.consequent = consequent
+        return cls.create((antecedent, consequent),
+                          antecedent.frozen and consequent.frozen,
+                          antecedent=antecedent, consequent=consequent)
+
+    def __reduce__(self):
+        return (Implication, (self.antecedent, self.consequent))
 
     def __eq__(self, other):
         return (isinstance(other, Implication)
                 and self.antecedent == other.antecedent
                 and self.consequent == other.consequent)
 
+    @cached("hash_value")
     def __hash__(self):
         return hash(("implies", hash(self.antecedent), hash(self.consequent)))
 
@@ -183,27 +378,47 @@ class Implication(Sentence):
         return ((not self.antecedent.evaluate(model))
                 or self.consequent.evaluate(model))
 
+    def evaluate_partial(self, model):
+        antecedent = self.antecedent.evaluate_partial(model)
+        if antecedent is False:
+            return True
+        consequent = self.consequent.evaluate_partial(model)
+        if consequent is True:
+            return True
+        if antecedent is None or consequent is None:
+            return None
+        return False
+
+    @cached("formula_text")
     def formula(self):
         antecedent = Sentence.parenthesize(self.antecedent.formula())
         consequent = Sentence.parenthesize(self.consequent.formula())
         return f"{antecedent} => {consequent}"
 
-    def symbols(self):
-        return set.union(self.antecedent.symbols(), self.consequent.symbols())
+    @cached("symbol_set")
+    def names(self):
+        return self.antecedent.names() | self.consequent.names()
 
 
 class Biconditional(Sentence):
-    def __init__(self, left, right):
+
+    __slots__ = ("left", "right")
+
+    def __new__(cls, left, right):
         Sentence.validate(left)
         Sentence.validate(right)
-        self.left = left
-        self.right = right
+        return cls.create((left, right), left.frozen and right.frozen,
+                          left=left, right=right)
+
+    def __reduce__(self):
+        return (Biconditional, (self.left, self.right))
 
     def __eq__(self, other):
         return (isinstance(other, Biconditional)
                 and self.left == other.left
                 and self.right == other.right)
 
+    @cached("hash_value")
     def __hash__(self):
         return hash(("biconditional", hash(self.left), hash(self.right)))
 
@@ -216,48 +431,882 @@ class Biconditional(Sentence):
                 or (not self.left.evaluate(model)
                     and not self.right.evaluate(model)))
 
+    def evaluate_partial(self, model):
+        left = self.left.evaluate_partial(model)
+        if left is None:
+            return None
+        right = self.right.evaluate_partial(model)
+        if right is None:
+            return None
+        return left == right
+
+    @cached("formula_text")
     def formula(self):
         left = Sentence.parenthesize(str(self.left))
         right = Sentence.parenthesize(str(self.right))
         return f"{left} <=> {right}"
 
-    def symbols(self):
-        return set.union(self.left.symbols(), self.right.symbols())
-
-
-def model_check(knowledge, query):
-    """Checks if knowledge base entails query."""
-
-    def check_all(knowledge, query, symbols, model):
-        """Checks if knowledge base entails query, given a particular model."""
-
-        # If model has an assignment for each symbol
-        if not symbols:
-
-            # If knowledge base is true in model, then query must also be true
-            if knowledge.evaluate(model):
-                return query.evaluate(model)
-            return True
+    @cached("symbol_set")
+    def names(self):
+        return self.left.names() | self.right.names()
+
+
+def compile_sentence(sentence, symbols, vectorized=False):
+    """
+    Compiles a sentence into a function of a sequence of truth values,
+    one for each symbol name in symbols, that returns what evaluate would
+    return for the model assigning those values.
+
+    The function is generated as flat Python code with one local variable
+    per distinct subexpression, so shared subexpressions are only computed
+    once per call. If vectorized, the values are NumPy boolean arrays or
+    scalars holding many models at once, and so is the result.
+    """
+    code = VECTOR_CODE if vectorized else SCALAR_CODE
+    index = {name: i for i, name in enumerate(symbols)}
+
+    # Each line is a variable, its expression and the variables it uses
+    lines = []
+
+    # Maps each distinct (operator, operands) to the variable holding it,
+    # and each node already visited to its variable
+    numbering = {}
+    visited = {}
+
+    def visit(sentence):
+        variable = visited.get(id(sentence))
+        if variable is not None:
+            return variable
+        if isinstance(sentence, Symbol):
+            if sentence.name not in index:
+                raise Exception(f"variable {sentence.name} not in model")
+            key = ("symbol", sentence.name)
+            expression = code["symbol"].format(index[sentence.name])
+            operands = ()
+        elif isinstance(sentence, Not):
+            operands = (visit(sentence.operand),)
+            expression = code["not"].format(*operands)
+        elif isinstance(sentence, And):
+            operands = tuple(visit(conjunct)
+                             for conjunct in sentence.conjuncts)
+            expression = code["and"].join(operands) or code["true"]
+        elif isinstance(sentence, Or):
+            operands = tuple(visit(disjunct)
+                             for disjunct in sentence.disjuncts)
+            expression = code["or"].join(operands) or code["false"]
+        elif isinstance(sentence, Implication):
+            operands = (visit(sentence.antecedent),
+                        visit(sentence.consequent))
+            expression = code["implies"].format(*operands)
+        elif isinstance(sentence, Biconditional):
+            operands = (visit(sentence.left), visit(sentence.right))
+            expression = code["biconditional"].format(*operands)
         else:
+            raise Exception("nothing to evaluate")
+        if not isinstance(sentence, Symbol):
+            key = (type(sentence).__name__, *operands)
+
+        variable = numbering.get(key)
+        if variable is None:
+            variable = f"v{len(numbering)}"
+            numbering[key] = variable
+            lines.append((variable, expression, operands))
+        visited[id(sentence)] = variable
+        return variable
+
+    result = visit(sentence)
+    body = [f"    {variable} = {expression}"
+            for variable, expression, _ in lines]
+
+    # Arrays can be large, so free each one after its last use
+    if vectorized:
+        last = {}
+        for i, (_, _, operands) in enumerate(lines):
+            for operand in operands:
+                last[operand] = i
+        body = []
+        for i, (variable, expression, operands) in enumerate(lines):
+            body.append(f"    {variable} = {expression}")
+            done = [operand for operand in dict.fromkeys(operands)
+                    if last[operand] == i and operand != result]
+            if done:
+                body.append(f"    del {', '.join(done)}")
+
+    source = "\n".join(
+        ["def evaluate(values):", *body, f"    return {result}"]
+    )
+    namespace = {}
+    if vectorized:
+        import numpy
+        namespace.update(TRUE=numpy.True_, FALSE=numpy.False_)
+    exec(source, namespace)
+    return namespace["evaluate"]
+
+
+class TruthTable():
+    """
+    Evaluates a sentence over the rows of its truth table, 2 ** bits rows
+    at a time with NumPy. In row r, symbol i is true if bit i of r is
+    set. Every chunk of rows shares the same columns for the low bits
+    symbols, while each of the others is constant within a chunk.
+    """
+
+    def __init__(self, sentence, symbols, bits):
+        import numpy
+        self.numpy = numpy
+        self.function = compile_sentence(sentence, symbols, vectorized=True)
+        self.bits = bits
+        self.high = len(symbols) - bits
+        rows = numpy.arange(2 ** bits, dtype=numpy.int64)
+        self.columns = [(rows >> i) & 1 == 1 for i in range(bits)]
+
+    def __call__(self, chunk):
+        """Returns whether the sentence is true in every row of chunk."""
+        values = self.columns + [self.numpy.bool_((chunk >> i) & 1)
+                                 for i in range(self.high)]
+        return bool(self.numpy.all(self.function(values)))
+
+
+# Truth table of the current worker process in numpy_check
+table = None
+
+
+def start_table(sentence, symbols, bits):
+    global table
+    table = TruthTable(sentence, symbols, bits)
+
+
+def check_chunk(chunk):
+    return table(chunk)
+
+
+class Solver():
+    """
+    CDCL SAT solver over clauses of integer literals, where variable v
+    appears as v when true and -v when false.
+
+    Unit propagation uses two watched literals per clause, conflicts are
+    analyzed to their first unique implication point and learned, and
+    decisions follow VSIDS activity with saved phases. The search
+    restarts on a Luby schedule and forgets half of its longer learned
+    clauses as they pile up.
+
+    The solver is incremental: clauses may be added between calls to
+    solve, which can also take assumptions, literals held true for that
+    call only. Learned clauses follow from the clauses alone, so they are
+    kept from one call to the next.
+    """
+
+    # Conflicts per unit of the Luby restart sequence
+    RESTART_BASE = 100
+    ACTIVITY_DECAY = 0.95
+
+    def __init__(self):
+        self.ok = True
+        self.num_variables = 0
+        self.clauses = []
+        self.learnts = []
+        self.max_learnts = 1000
+
+        # Internally, literal v is 2 * v and literal -v is 2 * v + 1,
+        # so a literal's negation is code ^ 1. values[code] is 1 if the
+        # literal is true, -1 if it is false and 0 if unassigned.
+        self.values = [0, 0]
+        self.watches = [[], []]
+
+        # Per variable
+        self.levels = [0]
+        self.reasons = [None]
+        self.activity = [0.0]
+        self.phases = [1]
+        self.seen = bytearray(1)
+
+        self.trail = []
+        self.trail_limits = []
+        self.propagated = 0
+        self.order = []
+        self.increment = 1.0
+        self.model = None
+
+    def new_variable(self):
+        """Returns a new variable, numbered from 1."""
+        self.num_variables += 1
+        self.values += [0, 0]
+        self.watches += [[], []]
+        self.levels.append(0)
+        self.reasons.append(None)
+        self.activity.append(0.0)
+        self.phases.append(1)
+        self.seen.append(0)
+        heapq.heappush(self.order, (0.0, self.num_variables))
+        return self.num_variables
+
+    def add_clause(self, literals):
+        """
+        Adds a clause, the disjunction of literals.
+        Returns False if the clauses have become unsatisfiable.
+        """
+        if not self.ok:
+            return False
+        self.backtrack(0)
+        values = self.values
+        codes = {2 * literal if literal > 0 else -2 * literal + 1
+                 for literal in literals}
+        clause = []
+        for code in codes:
+            if values[code] == 1 or code ^ 1 in codes:
+                return True
+            if values[code] == 0:
+                clause.append(code)
+
+        if not clause:
+            self.ok = False
+        elif len(clause) == 1:
+            self.assign(clause[0], None)
+            self.ok = self.propagate() is None
+        else:
+            self.attach(clause)
+        return self.ok
+
+    def solve(self, assumptions=()):
+        """
+        Returns whether the clauses, together with the assumed literals,
+        are satisfiable. If so, value gives the model found.
+        """
+        self.model = None
+        if not self.ok:
+            return False
+        assumptions = [2 * literal if literal > 0 else -2 * literal + 1
+                       for literal in assumptions]
+        restarts = 0
+        status = None
+        while status is None:
+            budget = self.RESTART_BASE * luby(restarts)
+            status = self.search(budget, assumptions)
+            restarts += 1
+        if status:
+            self.model = [self.values[2 * variable] == 1
+                          for variable in range(self.num_variables + 1)]
+        self.backtrack(0)
+        return status
+
+    def value(self, literal):
+        """Returns the truth of literal in the last model found."""
+        truth = self.model[abs(literal)]
+        return truth if literal > 0 else not truth
+
+    def search(self, budget, assumptions):
+        """
+        Searches until a model is found, returning True, the clauses are
+        shown unsatisfiable under the assumptions, returning False, or
+        budget conflicts have passed, returning None to restart.
+        """
+        values = self.values
+        trail = self.trail
+        limits = self.trail_limits
+        conflicts = 0
+        while True:
+            conflict = self.propagate()
+            if conflict is not None:
+                conflicts += 1
+                if not limits:
+                    self.ok = False
+                    return False
+                learnt, level = self.analyze(conflict)
+                self.backtrack(level)
+                if len(learnt) == 1:
+                    self.assign(learnt[0], None)
+                else:
+                    self.assign(learnt[0], self.attach(learnt, learnt=True))
+                self.increment /= self.ACTIVITY_DECAY
+                continue
+
+            if conflicts >= budget:
+                self.backtrack(0)
+                return None
+            if len(self.learnts) - len(trail) >= self.max_learnts:
+                self.reduce()
+
+            # Assumptions are the first decisions, one per level
+            decision = None
+            while len(limits) < len(assumptions):
+                assumption = assumptions[len(limits)]
+                if values[assumption] == 1:
+                    limits.append(len(trail))
+                elif values[assumption] == -1:
+                    return False
+                else:
+                    decision = assumption
+                    break
+
+            if decision is None:
+                variable = self.pick()
+                if variable is None:
+                    return True
+                decision = 2 * variable + self.phases[variable]
+            limits.append(len(trail))
+            self.assign(decision, None)
+
+    def assign(self, code, reason):
+        variable = code >> 1
+        self.values[code] = 1
+        self.values[code ^ 1] = -1
+        self.levels[variable] = len(self.trail_limits)
+        self.reasons[variable] = reason
+        self.trail.append(code)
+
+    def attach(self, clause, learnt=False):
+        """Stores a clause of two or more codes, watching its first two."""
+        index = len(self.clauses)
+        self.clauses.append(clause)
+        self.watches[clause[0]].append(index)
+        self.watches[clause[1]].append(index)
+        if learnt:
+            self.learnts.append(index)
+        return index
+
+    def propagate(self):
+        """
+        Assigns every literal implied by the trail.
+        Returns the index of a clause left false, or None.
+        """
+        values = self.values
+        clauses = self.clauses
+        watches = self.watches
+        trail = self.trail
+        while self.propagated < len(trail):
+            false = trail[self.propagated] ^ 1
+            self.propagated += 1
+
+            # Keep false as the second watch of each clause watching it,
+            # moving the watch to another literal that is not false if
+            # there is one
+            watchers = watches[false]
+            kept = 0
+            i = 0
+            while i < len(watchers):
+                index = watchers[i]
+                i += 1
+                clause = clauses[index]
+                if clause is None:
+                    continue
+                if clause[0] == false:
+                    clause[0] = clause[1]
+                    clause[1] = false
+                first = clause[0]
+                if values[first] == 1:
+                    watchers[kept] = index
+                    kept += 1
+                    continue
+                for k in range(2, len(clause)):
+                    literal = clause[k]
+                    if values[literal] != -1:
+                        clause[1] = literal
+                        clause[k] = false
+                        watches[literal].append(index)
+                        break
+                else:
+                    watchers[kept] = index
+                    kept += 1
+                    if values[first] == -1:
+                        watchers[kept:] = watchers[i:]
+                        self.propagated = len(trail)
+                        return index
+                    self.assign(first, index)
+            del watchers[kept:]
+        return None
+
+    def analyze(self, conflict):
+        """
+        Derives a learned clause from a conflict, with the literal it
+        asserts first and a literal of the level to go back to second.
+        Returns the clause and that level.
+        """
+        seen = self.seen
+        levels = self.levels
+        trail = self.trail
+        level = len(self.trail_limits)
+        learnt = [None]
+        pending = 0
+        code = None
+        index = len(trail) - 1
+        clause = self.clauses[conflict]
+        while True:
+            for literal in (clause if code is None else clause[1:]):
+                variable = literal >> 1
+                if not seen[variable] and levels[variable] > 0:
+                    seen[variable] = 1
+                    self.bump(variable)
+                    if levels[variable] >= level:
+                        pending += 1
+                    else:
+                        learnt.append(literal)
+
+            # Resolve with the reason of the latest literal involved
+            while not seen[trail[index] >> 1]:
+                index -= 1
+            code = trail[index]
+            index -= 1
+            seen[code >> 1] = 0
+            pending -= 1
+            if pending == 0:
+                break
+            clause = self.clauses[self.reasons[code >> 1]]
+
+        learnt[0] = code ^ 1
+        for literal in learnt[1:]:
+            seen[literal >> 1] = 0
+
+        back = 0
+        if len(learnt) > 1:
+            highest = max(range(1, len(learnt)),
+                          key=lambda i: levels[learnt[i] >> 1])
+            learnt[1], learnt[highest] = learnt[highest], learnt[1]
+            back = levels[learnt[1] >> 1]
+        return learnt, back
+
+    def backtrack(self, level):
+        """Undoes every assignment above level."""
+        if len(self.trail_limits) <= level:
+            return
+        start = self.trail_limits[level]
+        for code in self.trail[start:]:
+            variable = code >> 1
+            self.values[code] = 0
+            self.values[code ^ 1] = 0
+            self.reasons[variable] = None
+            self.phases[variable] = code & 1
+            heapq.heappush(self.order, (-self.activity[variable], variable))
+        del self.trail[start:]
+        del self.trail_limits[level:]
+        self.propagated = len(self.trail)
+
+        # Variables are pushed again each time they are unassigned, so
+        # drop the stale entries once they outnumber the variables
+        if len(self.order) > 4 * self.num_variables:
+            self.reorder()
+
+    def pick(self):
+        """Returns the unassigned variable of highest activity, or None."""
+        while self.order:
+            _, variable = heapq.heappop(self.order)
+            if self.values[2 * variable] == 0:
+                return variable
+        return None
+
+    def bump(self, variable):
+        self.activity[variable] += self.increment
+        if self.activity[variable] > 1e100:
+            self.activity = [activity * 1e-100 for activity in self.activity]
+            self.increment *= 1e-100
+            self.reorder()
+
+    def reorder(self):
+        """Rebuilds the decision heap from the unassigned variables."""
+        self.order = [(-self.activity[variable], variable)
+                      for variable in range(1, self.num_variables + 1)
+                      if self.values[2 * variable] == 0]
+        heapq.heapify(self.order)
+
+    def reduce(self):
+        """Forgets the longer half of the learned clauses not in use."""
+        clauses = self.clauses
+        values = self.values
+        reasons = self.reasons
+        self.learnts.sort(key=lambda index: len(clauses[index]))
+        keep = len(self.learnts) // 2
+        kept = self.learnts[:keep]
+        for index in self.learnts[keep:]:
+            clause = clauses[index]
+            if reasons[clause[0] >> 1] == index and values[clause[0]] == 1:
+                kept.append(index)
+            else:
+                clauses[index] = None
+        self.learnts = kept
+        self.max_learnts = int(self.max_learnts * 1.1)
+
+
+def luby(i):
+    """Returns the ith term, from 0, of the Luby sequence 1 1 2 1 1 2 4..."""
+    size = 1
+    exponent = 0
+    while size < i + 1:
+        size = 2 * size + 1
+        exponent += 1
+    while size - 1 != i:
+        size = (size - 1) // 2
+        exponent -= 1
+        i %= size
+    return 2 ** exponent
+
+
+class Encoder():
+    """
+    Tseitin encoding of sentences into a Solver's clauses. Each symbol
+    gets a variable, and each distinct connective a variable constrained
+    to equal it, so the clauses grow linearly with the sentences.
+    Negation needs no variable of its own.
+    """
+
+    def __init__(self, solver=None):
+        self.solver = Solver() if solver is None else solver
+        self.variables = {}
+        self.gates = {}
+        self.true = None
+
+    def add(self, sentence):
+        """Adds clauses requiring sentence to be true."""
+        if isinstance(sentence, And):
+            for conjunct in sentence.conjuncts:
+                self.add(conjunct)
+        elif isinstance(sentence, Or):
+            self.solver.add_clause([self.literal(disjunct)
+                                    for disjunct in sentence.disjuncts])
+        else:
+            self.solver.add_clause([self.literal(sentence)])
+
+    def literal(self, sentence):
+        """Returns a literal that is true exactly when sentence is."""
+        if isinstance(sentence, Symbol):
+            variable = self.variables.get(sentence.name)
+            if variable is None:
+                variable = self.solver.new_variable()
+                self.variables[sentence.name] = variable
+            return variable
+        if isinstance(sentence, Not):
+            return -self.literal(sentence.operand)
+        if isinstance(sentence, And):
+            return self.gate("and", [self.literal(conjunct)
+                                     for conjunct in sentence.conjuncts])
+        if isinstance(sentence, Or):
+            return self.gate("or", [self.literal(disjunct)
+                                    for disjunct in sentence.disjuncts])
+        if isinstance(sentence, Implication):
+            return self.gate("or", [-self.literal(sentence.antecedent),
+                                    self.literal(sentence.consequent)])
+        if isinstance(sentence, Biconditional):
+            return self.gate("iff", [self.literal(sentence.left),
+                                     self.literal(sentence.right)])
+        raise Exception("nothing to evaluate")
 
-            # Choose one of the remaining unused symbols
-            remaining = symbols.copy()
-            p = remaining.pop()
-
-            # Create a model where the symbol is true
-            model_true = model.copy()
-            model_true[p] = True
-
-            # Create a model where the symbol is false
-            model_false = model.copy()
-            model_false[p] = False
-
-            # Ensure entailment holds in both models
-            return (check_all(knowledge, query, remaining, model_true) and
-                    check_all(knowledge, query, remaining, model_false))
+    def gate(self, operator, operands):
+        """Returns the literal for operator applied to operand literals."""
+        if operator != "iff":
+            if not operands:
+                return self.constant() if operator == "and" else -self.constant()
+            if len(operands) == 1:
+                return operands[0]
+
+        key = (operator, *operands)
+        output = self.gates.get(key)
+        if output is not None:
+            return output
+        output = self.solver.new_variable()
+        self.gates[key] = output
+
+        add_clause = self.solver.add_clause
+        if operator == "and":
+            for operand in operands:
+                add_clause([-output, operand])
+            add_clause([output] + [-operand for operand in operands])
+        elif operator == "or":
+            for operand in operands:
+                add_clause([output, -operand])
+            add_clause([-output] + operands)
+        else:
+            left, right = operands
+            add_clause([-output, -left, right])
+            add_clause([-output, left, -right])
+            add_clause([output, left, right])
+            add_clause([output, -left, -right])
+        return output
+
+    def constant(self):
+        """Returns a literal that is always true."""
+        if self.true is None:
+            self.true = self.solver.new_variable()
+            self.solver.add_clause([self.true])
+        return self.true
+
+
+class KnowledgeBase():
+    """
+    Knowledge base kept as clauses in one Solver, for many queries.
+    Each add only encodes the new sentence, and queries reuse the
+    clauses, subexpressions and learned clauses of earlier ones.
+    Queries may assume sentences without adding them.
+
+    The last KEPT_MODELS models found are kept while they still satisfy
+    the knowledge base, so a query one of them refutes needs no solving.
+    """
+
+    def __init__(self, *sentences):
+        self.encoder = Encoder()
+        self.solver = self.encoder.solver
+        self.models = []
+        for sentence in sentences:
+            self.add(sentence)
+
+    def add(self, sentence):
+        Sentence.validate(sentence)
+        self.encoder.add(sentence)
+        self.models = [model for model in self.models
+                       if sentence.evaluate_partial(model)]
+
+    def consistent(self, assumptions=()):
+        """Checks if the knowledge base and assumptions can all be true."""
+        if self.recall(assumptions) is not None:
+            return True
+        if self.solver.solve(self.assume(assumptions)):
+            self.remember()
+            return True
+        return False
+
+    def entails(self, query, assumptions=()):
+        """
+        Checks if the knowledge base, with the assumed sentences, entails
+        query, by showing that they and the negated query cannot all be
+        true.
+        """
+        if self.recall([*assumptions, Not(query)]) is not None:
+            return False
+        literals = self.assume(assumptions)
+        literals.append(-self.encoder.literal(query))
+        if self.solver.solve(literals):
+            self.remember()
+            return False
+        return True
+
+    def classify(self, symbols, assumptions=()):
+        """
+        Returns a dict mapping each of symbols to YES, NO or MAYBE, as
+        classify_symbols does, under the assumed sentences.
+
+        Finds the backbone, the literals true in every model. Each model
+        found rules out, as MAYBE, every symbol whose value differs from
+        the first model, so each remaining symbol needs at most one more
+        call to the solver.
+        """
+        solver = self.solver
+        assumed = self.assume(assumptions)
+        literals = {symbol: self.encoder.literal(symbol)
+                    for symbol in symbols}
+        if not solver.solve(assumed):
+            return {symbol: YES for symbol in symbols}
+        self.remember()
+        first = {symbol: solver.value(literals[symbol]) for symbol in symbols}
+
+        answers = {}
+        for symbol in symbols:
+            if symbol in answers:
+                continue
+            literal = literals[symbol] if first[symbol] else -literals[symbol]
+            if solver.solve(assumed + [-literal]):
+                for other in symbols:
+                    if (other not in answers
+                            and solver.value(literals[other]) != first[other]):
+                        answers[other] = MAYBE
+            else:
+                answers[symbol] = YES if first[symbol] else NO
+
+                # The literal is entailed, so later calls may rely on it,
+                # and without assumptions so may later queries
+                if assumptions:
+                    assumed.append(literal)
+                else:
+                    solver.add_clause([literal])
+        return answers
+
+    def assume(self, assumptions):
+        """Returns a list of literals for the assumed sentences."""
+        return [self.encoder.literal(sentence) for sentence in assumptions]
+
+    def remember(self):
+        """Keeps the model the solver last found."""
+        value = self.solver.value
+        self.models.append({name: value(variable) for name, variable
+                            in self.encoder.variables.items()})
+        if len(self.models) > KEPT_MODELS:
+            del self.models[0]
+
+    def recall(self, sentences):
+        """
+        Returns a kept model in which all of sentences are true,
+        or None if there is none.
+        """
+        for model in self.models:
+            if all(sentence.evaluate_partial(model)
+                   for sentence in sentences):
+                return model
+        return None
+
+
+def sat_check(knowledge, query):
+    """
+    Checks if knowledge base entails query with the SAT solver, by
+    showing that the knowledge base and the negated query cannot both be
+    true.
+    """
+    return KnowledgeBase(knowledge).entails(query)
+
+
+def model_check(knowledge, query, engine=None):
+    """
+    Checks if knowledge base entails query with one of ENGINES: by
+    default, by searching the models with pruning if there are at most
+    ENUMERATION_LIMIT symbols and with the SAT solver otherwise.
+    """
+    if engine is None:
+        symbols = set.union(knowledge.symbols(), query.symbols())
+        engine = "prune" if len(symbols) <= ENUMERATION_LIMIT else "sat"
+    return ENGINES[engine](knowledge, query)
+
+
+def enumerate_check(knowledge, query):
+    """Checks if knowledge base entails query in every model, one by one."""
 
     # Get all symbols in both knowledge and query
-    symbols = set.union(knowledge.symbols(), query.symbols())
-
-    # Check that knowledge entails query
-    return check_all(knowledge, query, symbols, dict())
+    symbols = list(set.union(knowledge.symbols(), query.symbols()))
+
+    # Knowledge base entails query if, in every model where the knowledge
+    # base is true, query is also true
+    check = compile_sentence(Implication(knowledge, query), symbols)
+    models = itertools.product((True, False), repeat=len(symbols))
+    return all(check(model) for model in models)
+
+
+def prune_check(knowledge, query):
+    """
+    Checks if knowledge base entails query by assigning one symbol at a
+    time, the most frequent first, and evaluating each partial model.
+    A branch is cut off as soon as its assignments decide the answer:
+    once the knowledge base is false, or the query true, in all of it.
+    """
+    sentence = Implication(knowledge, query)
+    counts = count_symbols(sentence)
+    symbols = sorted(counts, key=lambda name: (-counts[name], name))
+
+    def check_all(model, assigned):
+        """Checks if entailment holds in every completion of model."""
+        value = sentence.evaluate_partial(model)
+        if value is not None:
+            return value
+
+        # Branch on the next symbol, undoing the assignment afterwards
+        p = symbols[assigned]
+        model[p] = True
+        entailed = check_all(model, assigned + 1)
+        if entailed:
+            model[p] = False
+            entailed = check_all(model, assigned + 1)
+        del model[p]
+        return entailed
+
+    return check_all(dict(), 0)
+
+
+def count_symbols(sentence, counts=None):
+    """Returns a dict counting the occurrences of each symbol name."""
+    if counts is None:
+        counts = {}
+    if isinstance(sentence, Symbol):
+        counts[sentence.name] = counts.get(sentence.name, 0) + 1
+    elif isinstance(sentence, Not):
+        count_symbols(sentence.operand, counts)
+    elif isinstance(sentence, And):
+        for conjunct in sentence.conjuncts:
+            count_symbols(conjunct, counts)
+    elif isinstance(sentence, Or):
+        for disjunct in sentence.disjuncts:
+            count_symbols(disjunct, counts)
+    elif isinstance(sentence, Implication):
+        count_symbols(sentence.antecedent, counts)
+        count_symbols(sentence.consequent, counts)
+    elif isinstance(sentence, Biconditional):
+        count_symbols(sentence.left, counts)
+        count_symbols(sentence.right, counts)
+    else:
+        raise Exception("nothing to evaluate")
+    return counts
+
+
+def numpy_check(knowledge, query, bits=18, processes=None):
+    """
+    Checks if knowledge base entails query in every row of the truth
+    table, evaluated as NumPy arrays of 2 ** bits rows at a time.
+    With PARALLEL_CHUNKS or more chunks, they are spread over a pool of
+    processes, one per core unless processes is given.
+    """
+    symbols = sorted(set.union(knowledge.symbols(), query.symbols()))
+    sentence = Implication(knowledge, query)
+    bits = min(bits, len(symbols))
+    chunks = range(2 ** (len(symbols) - bits))
+    if len(chunks) < PARALLEL_CHUNKS or processes == 1:
+        check = TruthTable(sentence, symbols, bits)
+        return all(check(chunk) for chunk in chunks)
+
+    import multiprocessing
+    with multiprocessing.Pool(processes, start_table,
+                              (sentence, symbols, bits)) as pool:
+        return all(pool.imap_unordered(check_chunk, chunks))
+
+
+# Ways model_check can decide entailment
+ENGINES = {
+    "enumerate": enumerate_check,
+    "numpy": numpy_check,
+    "prune": prune_check,
+    "sat": sat_check
+}
+
+
+def classify_symbols(knowledge, symbols, engine=None):
+    """
+    Returns a dict mapping each of symbols to YES if knowledge base
+    entails it, NO if knowledge base entails its negation and MAYBE
+    otherwise, as model_check would find one symbol at a time.
+    The engine is "enumerate" or "sat", chosen as for model_check.
+    """
+    if engine is None:
+        names = set.union(knowledge.symbols(),
+                          {symbol.name for symbol in symbols})
+        engine = "enumerate" if len(names) <= ENUMERATION_LIMIT else "sat"
+    return CLASSIFIERS[engine](knowledge, symbols)
+
+
+def enumerate_classify(knowledge, symbols):
+    """Classifies symbols by the values they take in every model."""
+    names = list(set.union(knowledge.symbols(),
+                           {symbol.name for symbol in symbols}))
+    check = compile_sentence(knowledge, names)
+    models = [model
+              for model in itertools.product((True, False), repeat=len(names))
+              if check(model)]
+
+    answers = {}
+    for symbol in symbols:
+        i = names.index(symbol.name)
+        answers[symbol] = answer(any(model[i] for model in models),
+                                 not all(model[i] for model in models))
+    return answers
+
+
+def sat_classify(knowledge, symbols):
+    """Classifies symbols by the backbone of knowledge base."""
+    return KnowledgeBase(knowledge).classify(symbols)
+
+
+def answer(can_be_true, can_be_false):
+    """Classifies a symbol by whether models allow it to be each value."""
+    if not can_be_false:
+        return YES
+    if not can_be_true:
+        return NO
+    return MAYBE
+
+
+# Ways classify_symbols can classify symbols
+CLASSIFIERS = {
+    "enumerate": enumerate_classify,
+    "sat": sat_classify
+}
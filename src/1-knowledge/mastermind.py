@@ -51,6 +51,7 @@ knowledge.add(And(
     Not(Symbol("yellow3"))
 ))
 
+answers = classify_symbols(knowledge, symbols)
 for symbol in symbols:
-    if model_check(knowledge, symbol):
+    if answers[symbol] == YES:
         print(symbol)